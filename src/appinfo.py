@@ -14,28 +14,266 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import gc
 import os
+from concurrent.futures import ThreadPoolExecutor
 from hashlib import sha1
-from struct import pack, unpack
+from struct import pack, unpack, unpack_from
 
 
 APPINFO_29 = 0x107564429
 APPINFO_28 = 0x107564428
 
+# appid, size, state, last_update, access_token, checksum_text,
+# change_number and checksum_binary
+APP_HEADER_SIZE = 68
+
 
 class IncompatibleVDFError(Exception):
     def __init__(self, vdf_version):
         self.vdf_version = vdf_version
 
 
+class CorruptedDataError(Exception):
+    pass
+
+
+def walk_apps(data, apps_start, report):
+    """
+    Follows the size fields from app to app. Returns the appid, start
+    and end of every app and where the list of apps ended, or None if it
+    ran past the end of the data.
+    """
+    spans = []
+    seen = set()
+    offset = apps_start
+    while True:
+        if offset + 4 > len(data):
+            report["errors"].append(f"Apps run past the end of the file at {offset}")
+            return spans, None
+        app_id = unpack_from("<I", data, offset)[0]
+        if app_id == 0:
+            return spans, offset
+
+        if offset + APP_HEADER_SIZE > len(data):
+            report["corrupt"].append((app_id, f"header cut short at {offset}"))
+            return spans, None
+        size = unpack_from("<I", data, offset + 4)[0]
+        end = offset + size + 8
+        if size < APP_HEADER_SIZE - 8 or end > len(data):
+            report["corrupt"].append((app_id, f"invalid size {size} at {offset}"))
+            return spans, None
+        if app_id in seen:
+            report["corrupt"].append((app_id, f"duplicate appid at {offset}"))
+        seen.add(app_id)
+        spans.append((app_id, offset, end))
+        offset = end
+
+
+def check_string_table(data, apps_end, report):
+    string_offset = unpack_from("<q", data, 8)[0]
+    if apps_end is not None and apps_end + 4 != string_offset:
+        report["errors"].append(
+            f"String table offset is {string_offset}, the apps end at {apps_end + 4}"
+        )
+    if not 16 <= string_offset <= len(data) - 4:
+        report["errors"].append(f"String table offset {string_offset} is out of the file")
+        return
+
+    string_count = unpack_from("<I", data, string_offset)[0]
+    table = data[string_offset + 4:]
+    found = table.count(b"\x00")
+    if found != string_count:
+        report["errors"].append(
+            f"String table says it has {string_count} strings, it has {found}"
+        )
+    elif table and table[-1] != 0:
+        report["errors"].append("String table doesn't end with a null byte")
+    report["strings"] = found
+
+
+def check_layout(data, report):
+    """
+    Checks that the app sizes lead from one app to the next up to the
+    appid 0 that ends the list, and what comes after it: the string
+    table on APPINFO_29, nothing on APPINFO_28. Problems are added to
+    report. Returns the appid, start and end of every app.
+    """
+    version = unpack_from("<Q", data)[0] if len(data) >= 8 else None
+    if version not in (APPINFO_28, APPINFO_29):
+        report["errors"].append(f"Unknown version {version}")
+        return []
+    apps_start = 16 if version == APPINFO_29 else 8
+    if len(data) < apps_start:
+        report["errors"].append("The file header is cut short")
+        return []
+
+    spans, apps_end = walk_apps(data, apps_start, report)
+    if version == APPINFO_29:
+        check_string_table(data, apps_end, report)
+    elif apps_end is not None and apps_end + 4 != len(data):
+        report["errors"].append(
+            f"{len(data) - apps_end - 4} unexpected bytes after the last app"
+        )
+    return spans
+
+
+def check_checksums(data, spans):
+    # Returns the appids whose body doesn't match its checksum_binary
+    mismatched = []
+    for app_id, start, end in spans:
+        checksum = bytes(data[start + APP_HEADER_SIZE - 20:start + APP_HEADER_SIZE])
+        if sha1(data[start + APP_HEADER_SIZE:end]).digest() != checksum:
+            mismatched.append(app_id)
+    return mismatched
+
+
+class Section(dict):
+    """
+    Dictionary that remembers where it was decoded from, so it can be
+    written back by copying its original bytes instead of encoding it
+    again. Any change made to it or to one of its child sections clears
+    that information, up to the root of the app.
+    """
+
+    __slots__ = ("span", "parent", "text")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # (source bytes, start, end) of the encoded section
+        self.span = None
+        self.parent = None
+        # (number of tabs, text) as formatted by dict_to_text_vdf
+        self.text = None
+
+    def invalidate(self):
+        section = self
+        while section is not None and section.span is not None:
+            section.span = None
+            section.text = None
+            section = section.parent
+
+    def __setitem__(self, key, value):
+        if isinstance(value, Section):
+            if value.parent is not None and value.parent is not self:
+                # It belongs to another tree, which must still be
+                # invalidated by changes made through it
+                value = copy_sections(value)
+            value.parent = self
+        super().__setitem__(key, value)
+        self.invalidate()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.invalidate()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        super().clear()
+        self.invalidate()
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self.invalidate()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self.invalidate()
+        return item
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+
+def copy_sections(data):
+    """
+    Copies a tree of sections, plain dictionaries included, into new
+    Sections that keep the span and text of the ones they were copied
+    from. Only the dictionaries are copied, strings and integers are
+    shared, so it's much cheaper than encoding the tree.
+    """
+    copy = Section()
+    for key, value in data.items():
+        if isinstance(value, dict):
+            value = copy_sections(value)
+            value.parent = copy
+        dict.__setitem__(copy, key, value)
+    if isinstance(data, Section):
+        copy.span = data.span
+        copy.text = data.text
+    return copy
+
+
+class SpanSource(bytes):
+    """
+    Bytes sections are decoded from. On APPINFO_29 it remembers the
+    string pool its key indices refer to, so sections can still be
+    copied after the string table is rebuilt.
+    """
+
+    def __new__(cls, data, string_pool=None):
+        source = super().__new__(cls, data)
+        source.string_pool = string_pool
+        return source
+
+
+class LazyAppDict(dict):
+    """
+    Dictionary of parsed apps that decodes each app the first time
+    it's accessed.
+    """
+
+    def __init__(self, appinfo):
+        super().__init__()
+        self.appinfo = appinfo
+
+    def __missing__(self, app_id):
+        app = self.appinfo.read_app(app_id)
+        self[app_id] = app
+        return app
+
+
 class Appinfo:
-    def __init__(self, vdf_path, choose_apps=False, apps=None):
+    def __init__(
+        self, vdf_path, choose_apps=False, apps=None, stream=False, lazy=False
+    ):
         self.offset = 0
         self.string_pool = []
+        # key -> index in string_pool, see get_string_indexes
+        self.string_indexes = None
+        # Keys that aren't valid UTF-8 and were decoded as latin-1
+        self.latin1_keys = set()
         self.string_offset = 0
+        # Indices of keys that may not be used by any app anymore,
+        # checked when the string table is rebuilt. Keys from
+        # checked_pool_size on haven't been checked at all, so the first
+        # rebuild looks at every key, the file may already hold keys no
+        # app uses.
+        self.dropped_keys = set()
+        self.checked_pool_size = 0
+        # Apps whose bytes changed since the last write
+        self.rewritten_apps = set()
 
         self.version = 0
         self.vdf_path = vdf_path
+        self.stream = stream
+        self.app_offsets = None
+
+        # Bytes decoded sections point to, see Section
+        self.span_source = None
+        self.span_base = 0
+        # Section being parsed, the parent of the ones inside it
+        self.parent_section = None
 
         self.COMPATIBLE_VERSIONS = [APPINFO_29, APPINFO_28]
 
@@ -52,20 +290,34 @@ class Appinfo:
         self.INT_SECTION_END = int.from_bytes(self.SECTION_END, "little")
 
         with open(self.vdf_path, "rb") as vdf:
-            self.appinfoData = bytearray(vdf.read())
+            if stream:
+                # Apps are read from disk one at a time by iter_apps,
+                # only the file header is kept around
+                self.appinfoData = bytearray(vdf.read(16))
+            else:
+                self.appinfoData = bytearray(vdf.read())
 
         self.verify_vdf_version()
         if self.version == APPINFO_29:
             self.string_offset = self.read_int64()
             prev_offset = self.offset
-            self.offset = self.string_offset
-            string_count = self.read_uint32()
-            for i in range(string_count):
-                self.string_pool.append(self.read_string())
+            if stream:
+                with open(self.vdf_path, "rb") as vdf:
+                    vdf.seek(self.string_offset)
+                    self.appinfoData = bytearray(vdf.read())
+                self.offset = 0
+            else:
+                self.offset = self.string_offset
+            self.read_string_table()
             self.offset = prev_offset
 
+        if stream:
+            self.parsedAppInfo = {}
+        # Apps are decoded when first accessed
+        elif lazy:
+            self.parsedAppInfo = LazyAppDict(self)
         # Load only the modified apps
-        if choose_apps:
+        elif choose_apps:
             self.parsedAppInfo = {}
             for app in apps:
                 self.parsedAppInfo[app] = self.read_app(app)
@@ -82,6 +334,35 @@ class Appinfo:
         self.offset += str_end - self.offset + 1
         return string
 
+    def read_string_table(self):
+        # The whole table is decoded at once, it's only split and
+        # decoded key by key if some key isn't valid UTF-8
+        string_count = self.read_uint32()
+        table = self.appinfoData[self.offset:]
+        try:
+            strings = table.decode("utf-8").split("\x00")
+        except UnicodeDecodeError:
+            strings = []
+            for string in table.split(self.SEPARATOR):
+                try:
+                    strings.append(string.decode("utf-8"))
+                except UnicodeDecodeError:
+                    string = string.decode("latin-1")
+                    self.latin1_keys.add(string)
+                    strings.append(string)
+        self.string_pool = strings[:string_count]
+        self.string_indexes = None
+        self.offset = len(self.appinfoData)
+
+    def get_string_indexes(self):
+        # Only needed to encode keys, so it's built the first time one
+        # is. Keys in the pool more than once map to their first index.
+        if self.string_indexes is None:
+            self.string_indexes = dict(
+                zip(reversed(self.string_pool), range(len(self.string_pool) - 1, -1, -1))
+            )
+        return self.string_indexes
+
     def read_string_appinfo29(self):
         index = self.read_uint32()
         return self.string_pool[index]
@@ -107,7 +388,16 @@ class Appinfo:
         return byte
 
     def parse_subsections(self):
+        start = self.offset
         subsection = {}
+        if self.span_source is not None:
+            # Section.__init__ is skipped, the slots are set below, and
+            # the keys go into a plain dictionary first so Section's
+            # __setitem__ doesn't slow down the whole parse. There's
+            # nothing to invalidate yet.
+            section = Section.__new__(Section)
+            parent = self.parent_section
+            self.parent_section = section
         value_parsers = {
             self.INT_TYPE_DICT: self.parse_subsections,
             self.INT_TYPE_STRING: self.read_string,
@@ -127,7 +417,19 @@ class Appinfo:
 
             subsection[key] = value
 
-        return subsection
+        if self.span_source is None:
+            return subsection
+
+        dict.update(section, subsection)
+        section.span = (
+            self.span_source,
+            start - self.span_base,
+            self.offset - self.span_base,
+        )
+        section.parent = parent
+        section.text = None
+        self.parent_section = parent
+        return section
 
     def read_header(self):
         keys = [
@@ -169,15 +471,21 @@ class Appinfo:
             raise IncompatibleVDFError(self.version)
 
     def read_app(self, app_id):
-        # All relevant apps will have a previous section ending before them
-        # This ensures we are indeed getting an appid instead of some other
-        # random number
-        byte_data = self.SECTION_END + pack("<I", app_id)
-        self.offset = self.appinfoData.find(byte_data) + 1
-        if self.offset == 0:
+        span = self.get_app_span(app_id)
+        if span is None:
             os._exit(2)
+
+        # Keep a copy of the original app so unmodified sections can
+        # be written back as they are
+        self.offset = span[0]
+        self.span_source = SpanSource(
+            self.appinfoData[span[0]:span[1]], self.string_pool
+        )
+        self.span_base = span[0]
+
         app = self.read_header()
         app["sections"] = self.parse_subsections()
+        self.span_source = None
         app["installed"] = False
         app["install_path"] = "."
         return app
@@ -195,14 +503,332 @@ class Appinfo:
 
     def read_all_apps(self):
         apps = {}
-        while not self.stop_reading():
-            app = self.read_header()
-            app["sections"] = self.parse_subsections()
-            app["installed"] = False
-            app["install_path"] = "."
-            apps[app["appid"]] = app
+        self.span_source = SpanSource(self.appinfoData, self.string_pool)
+        self.span_base = 0
+        # Every Section is tracked by the garbage collector, unlike
+        # plain dictionaries of strings and integers. None of them is
+        # garbage, but the collections triggered while they're created
+        # would take longer than the parse itself.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            while not self.stop_reading():
+                app = self.read_header()
+                app["sections"] = self.parse_subsections()
+                app["installed"] = False
+                app["install_path"] = "."
+                apps[app["appid"]] = app
+        finally:
+            if gc_enabled:
+                gc.enable()
+        self.span_source = None
         return apps
 
+    def get_apps_start(self):
+        # Version, plus the string table offset on APPINFO_29
+        return 16 if self.version == APPINFO_29 else 8
+
+    def read_app_at(self, offset, header_only=False):
+        self.offset = offset
+        header = self.read_header()
+        sections = None if header_only else self.parse_subsections()
+        return header, sections
+
+    def parse_app_data(self, data, header_only=False):
+        # Decodes an app given its raw header and body
+        self.appinfoData = bytearray(data)
+        return self.read_app_at(0, header_only)
+
+    def iter_app_spans(self, apps=None):
+        """
+        Walks the app headers of the loaded file and yields the appid,
+        start and end offsets of every app.
+        """
+        if apps is not None:
+            apps = set(apps)
+            if not apps:
+                return
+
+        offset = self.get_apps_start()
+        end = len(self.appinfoData)
+        while offset + 8 <= end:
+            app_id, size = unpack("<2I", self.appinfoData[offset:offset + 8])
+            # The last appid is 0 and has no data
+            if app_id == 0:
+                break
+            if apps is None or app_id in apps:
+                yield app_id, offset, offset + size + 8
+                if apps is not None:
+                    apps.discard(app_id)
+                    if not apps:
+                        break
+            offset += size + 8
+
+    def iter_raw_apps(self, apps=None, header_only=False):
+        """
+        Yields the raw bytes (header and body) of every app in file order.
+        With header_only, only the header bytes are returned.
+        """
+        if not self.stream:
+            for app_id, start, end in self.iter_app_spans(apps):
+                if header_only:
+                    end = start + APP_HEADER_SIZE
+                yield bytes(self.appinfoData[start:end])
+            return
+
+        if apps is not None:
+            apps = set(apps)
+            if not apps:
+                return
+
+        with open(self.vdf_path, "rb") as vdf:
+            vdf.seek(self.get_apps_start())
+            while True:
+                app_start = vdf.read(8)
+                if len(app_start) < 8:
+                    break
+                app_id, size = unpack("<2I", app_start)
+                if app_id == 0:
+                    break
+                if apps is not None and app_id not in apps:
+                    vdf.seek(size, os.SEEK_CUR)
+                    continue
+
+                if header_only:
+                    yield app_start + vdf.read(APP_HEADER_SIZE - 8)
+                    vdf.seek(size - APP_HEADER_SIZE + 8, os.SEEK_CUR)
+                else:
+                    yield app_start + vdf.read(size)
+
+                if apps is not None:
+                    apps.discard(app_id)
+                    if not apps:
+                        break
+
+    def iter_apps(self, apps=None, header_only=False):
+        """
+        Yields a (header, sections) tuple for every app in file order,
+        only one app is decoded at a time. When the instance was created
+        with stream=True, apps are also read from disk one by one, so
+        memory usage doesn't depend on the size of the file.
+
+        apps optionally restricts the output to the given appids.
+        header_only skips decoding the sections, which are then None.
+        """
+        if self.stream:
+            for data in self.iter_raw_apps(apps, header_only):
+                yield self.parse_app_data(data, header_only)
+        else:
+            for app_id, start, end in self.iter_app_spans(apps):
+                yield self.read_app_at(start, header_only)
+
+    def encode_projection_key(self, key):
+        # Keys are compared as they are stored in the file, so they
+        # never need to be decoded
+        if self.version == APPINFO_29:
+            index = self.get_string_indexes().get(key)
+            return None if index is None else self.encode_uint32(index)
+        return key.encode()
+
+    def build_projection(self, paths):
+        # Turns key paths like "appinfo/common/name" into a tree of
+        # encoded keys, leaves hold the path they belong to
+        projection = {}
+        for path in sorted(paths, key=len):
+            node = projection
+            keys = [self.encode_projection_key(key) for key in path.split("/")]
+            if None in keys:
+                continue
+            for key in keys[:-1]:
+                node = node.setdefault(key, {})
+                if isinstance(node, str):
+                    break
+            else:
+                node[keys[-1]] = path
+        return projection
+
+    def read_key_bytes(self):
+        if self.version == APPINFO_29:
+            key = bytes(self.appinfoData[self.offset:self.offset + 4])
+            self.offset += 4
+        else:
+            key_end = self.appinfoData.find(self.INT_SEPARATOR, self.offset)
+            key = bytes(self.appinfoData[self.offset:key_end])
+            self.offset = key_end + 1
+        return key
+
+    def skip_value(self, value_type):
+        if value_type == self.INT_TYPE_DICT:
+            self.skip_subsections()
+        elif value_type == self.INT_TYPE_STRING:
+            self.offset = self.appinfoData.find(self.INT_SEPARATOR, self.offset) + 1
+        elif value_type == self.INT_TYPE_INT32:
+            self.offset += 4
+        else:
+            raise KeyError(value_type)
+
+    def skip_subsections(self, depth=1):
+        # Same walk as parse_subsections, but nothing gets decoded.
+        # depth is the number of nested sections to get out of.
+        data = self.appinfoData
+        offset = self.offset
+        appinfo29 = self.version == APPINFO_29
+        while depth:
+            value_type = data[offset]
+            offset += 1
+            if value_type == self.INT_SECTION_END:
+                depth -= 1
+                continue
+
+            if appinfo29:
+                offset += 4
+            else:
+                offset = data.find(self.INT_SEPARATOR, offset) + 1
+
+            if value_type == self.INT_TYPE_DICT:
+                depth += 1
+            elif value_type == self.INT_TYPE_STRING:
+                offset = data.find(self.INT_SEPARATOR, offset) + 1
+            elif value_type == self.INT_TYPE_INT32:
+                offset += 4
+            else:
+                raise KeyError(value_type)
+        self.offset = offset
+
+    def project_subsections(self, projection, fields):
+        # Returns how many sections were left unfinished, this one
+        # included, because every requested field was found: 0 if it
+        # was read until its end
+        remaining = len(projection)
+        while remaining:
+            value_type = self.read_byte()
+            if value_type == self.INT_SECTION_END:
+                return 0
+
+            node = projection.get(self.read_key_bytes())
+            if node is None:
+                self.skip_value(value_type)
+                continue
+
+            remaining -= 1
+            if isinstance(node, str):
+                if value_type == self.INT_TYPE_DICT:
+                    fields[node] = self.parse_subsections()
+                elif value_type == self.INT_TYPE_STRING:
+                    fields[node] = self.read_string()
+                elif value_type == self.INT_TYPE_INT32:
+                    fields[node] = self.read_uint32()
+                else:
+                    raise KeyError(value_type)
+            elif value_type == self.INT_TYPE_DICT:
+                unfinished = self.project_subsections(node, fields)
+                if unfinished and not remaining:
+                    return unfinished + 1
+                if unfinished:
+                    self.skip_subsections(unfinished)
+            else:
+                self.skip_value(value_type)
+
+        return 1
+
+    def iter_fields(self, paths, apps=None):
+        """
+        Yields an (appid, fields) tuple for every app, where fields maps
+        each of the given key paths (e.g. "appinfo/common/name") to its
+        value. Paths an app doesn't have are left out. Everything else
+        is skipped without being decoded, and scanning an app stops as
+        soon as all of its requested fields were found.
+        """
+        projection = self.build_projection(paths)
+
+        if self.stream:
+            spans = (
+                (0, len(data), data) for data in self.iter_raw_apps(apps)
+            )
+        else:
+            spans = (
+                (start, end, None) for app_id, start, end in self.iter_app_spans(apps)
+            )
+
+        for start, end, data in spans:
+            if data is not None:
+                self.appinfoData = bytearray(data)
+            app_id = unpack("<I", self.appinfoData[start:start + 4])[0]
+            fields = {}
+            if projection:
+                self.offset = start + APP_HEADER_SIZE
+                self.project_subsections(projection, fields)
+            yield app_id, fields
+
+    def get_app_span(self, app_id):
+        # Returns the start and end offsets of an app, or None if
+        # it's not in the file
+        if self.app_offsets is None:
+            self.app_offsets = {
+                app: start for app, start, end in self.iter_app_spans()
+            }
+
+        start = self.app_offsets.get(app_id)
+        if start is None:
+            return None
+        size = unpack("<I", self.appinfoData[start + 4:start + 8])[0]
+        return start, start + size + 8
+
+    def get_app_bytes(self, app_id):
+        start, end = self.get_app_span(app_id)
+        return bytes(self.appinfoData[start:end])
+
+    def replace_app_bytes(self, app_id, data):
+        """
+        Replaces an app with the given raw header and body, or adds it
+        after the last app if it's not in the file.
+        """
+        span = self.get_app_span(app_id)
+        if span is None:
+            # Right before the last appid, which is always 0
+            end = max(
+                (end for app, start, end in self.iter_app_spans()),
+                default=self.get_apps_start(),
+            )
+            span = (end, end)
+        self.drop_keys(
+            self.appinfoData[span[0] + APP_HEADER_SIZE:span[1]], data[APP_HEADER_SIZE:]
+        )
+        self.appinfoData[span[0]:span[1]] = data
+        self.app_offsets = None
+        self.rewritten_apps.add(app_id)
+
+        if app_id in self.parsedAppInfo:
+            self.parsedAppInfo[app_id] = self.read_app(app_id)
+
+    def translate_keys(self, data, offset, translate):
+        """
+        Returns a copy of the APPINFO_29 section starting at offset, with
+        every key index replaced by translate(index).
+        """
+        data = bytearray(data)
+        depth = 1
+        while depth:
+            value_type = data[offset]
+            offset += 1
+            if value_type == self.INT_SECTION_END:
+                depth -= 1
+                continue
+
+            index = unpack("<I", data[offset:offset + 4])[0]
+            data[offset:offset + 4] = self.encode_uint32(translate(index))
+            offset += 4
+
+            if value_type == self.INT_TYPE_DICT:
+                depth += 1
+            elif value_type == self.INT_TYPE_STRING:
+                offset = data.find(self.INT_SEPARATOR, offset) + 1
+            elif value_type == self.INT_TYPE_INT32:
+                offset += 4
+            else:
+                raise KeyError(value_type)
+        return data
+
     def encode_header(self, data):
         return pack(
             "<4IQ20sI20s",
@@ -228,16 +854,39 @@ class Appinfo:
     def encode_int64(self, integer):
         return pack("<q", integer)
 
-    def encode_key_appinfo29(self, key):
-        try:
-            index = self.string_pool.index(key)
-        except ValueError:
+    def get_key_index(self, key):
+        # New keys are added to the end of the string pool, the string
+        # table itself is written by rebuild_string_table
+        string_indexes = self.get_string_indexes()
+        index = string_indexes.get(key)
+        if index is None:
+            index = string_indexes[key] = len(self.string_pool)
             self.string_pool.append(key)
-            self.appinfoData += self.encode_string(key)
-        index = self.string_pool.index(key)
-        return self.encode_uint32(index)
+        return index
+
+    def encode_key_appinfo29(self, key):
+        return self.encode_uint32(self.get_key_index(key))
 
     def encode_subsections(self, data):
+        # Sections that weren't modified since they were read are copied
+        # as they are
+        if isinstance(data, Section) and data.span is not None:
+            source, start, end = data.span
+            if self.version == APPINFO_29 and source.string_pool is not self.string_pool:
+                # Decoded before the string table was rebuilt
+                old_pool = source.string_pool
+                source = SpanSource(
+                    self.translate_keys(
+                        source[start:end],
+                        0,
+                        lambda index: self.get_key_index(old_pool[index]),
+                    ),
+                    self.string_pool,
+                )
+                data.span = (source, 0, len(source))
+                return bytes(source)
+            return source[start:end]
+
         encoded_data = bytearray()
         for key, value in data.items():
             key = self.encode_string(key) if self.version == APPINFO_28 else self.encode_key_appinfo29(key)
@@ -276,44 +925,237 @@ class Appinfo:
 
         return appinfo
 
-    def update_string_offset_and_count(self):
-        string_count = len(self.string_pool)
-        encoded_string_count = self.encode_uint32(string_count)
-        last_app_start_index = self.appinfoData.rfind(b'\x08\x00\x00\x00\x00')
-        string_table_offset = last_app_start_index + 5
-        encoded_offset = self.encode_int64(string_table_offset)
-        self.appinfoData[8:16] = encoded_offset
-        self.appinfoData[string_table_offset:string_table_offset + 4] = encoded_string_count
+    def get_key_indexes(self, data, offset):
+        # Indices of every key in the APPINFO_29 section at offset
+        indexes = set()
+        depth = 1
+        while depth:
+            value_type = data[offset]
+            offset += 1
+            if value_type == self.INT_SECTION_END:
+                depth -= 1
+                continue
 
-    def update_app(self, app_id):
-        appinfo = self.parsedAppInfo[app_id]
-        encoded_subsections = self.encode_subsections(appinfo["sections"])
-        old_header = self.encode_header(appinfo)
-
-        # appid and size fields don't count towards the total of the
-        # size field, so we skip them by removing 8 bytes from the
-        # header size
-        size = len(encoded_subsections) + len(old_header) - 8
-        checksum_text = self.get_text_checksum(appinfo["sections"])
-        checksum_binary = self.get_binary_checksum(encoded_subsections)
-
-        app_location = self.appinfoData.find(old_header)
-        app_end_location = app_location + appinfo["size"] + 8
-
-        self.parsedAppInfo[app_id] = self.update_header_size_and_checksums(
-            appinfo, size, checksum_text, checksum_binary
+            indexes.add(unpack_from("<I", data, offset)[0])
+            offset += 4
+
+            if value_type == self.INT_TYPE_DICT:
+                depth += 1
+            elif value_type == self.INT_TYPE_STRING:
+                offset = data.find(self.INT_SEPARATOR, offset) + 1
+            elif value_type == self.INT_TYPE_INT32:
+                offset += 4
+            else:
+                raise KeyError(value_type)
+        return indexes
+
+    def drop_keys(self, old_body, new_body):
+        # Remembers the keys an app stopped using when its body is
+        # replaced
+        if self.version != APPINFO_29 or not old_body:
+            return
+        self.dropped_keys |= (
+            self.get_key_indexes(old_body, 0) - self.get_key_indexes(new_body, 0)
         )
 
-        updated_header = self.encode_header(appinfo)
+    def find_unused_keys(self, spans):
+        """
+        Returns the indices of the keys dropped by some app, or not
+        checked since the file was read or the last rebuild, that no app
+        uses. Apps are only walked until every one of them is found.
+        """
+        unused = self.dropped_keys | set(
+            range(self.checked_pool_size, len(self.string_pool))
+        )
+        for app_id, start, end in spans:
+            if not unused:
+                break
+            unused -= self.get_key_indexes(self.appinfoData, start + APP_HEADER_SIZE)
+        return unused
 
-        if app_location != -1:
-            self.appinfoData[app_location:app_end_location] = updated_header + encoded_subsections
-        else:
-            self.appinfoData.extend(updated_header + encoded_subsections)
+    def rebuild_string_table(self):
+        """
+        Writes the APPINFO_29 string table after the last app, with the
+        keys of the string pool that are still used, in the same order.
+        When keys in the middle of the pool are dropped, every app has
+        its key indices and checksum_binary updated.
+        """
+        spans = list(self.iter_app_spans())
+        apps_end = spans[-1][2] if spans else self.get_apps_start()
+        unused = self.find_unused_keys(spans)
+
+        chunks = [self.appinfoData[:apps_end]]
+        if unused:
+            string_pool = [
+                key for index, key in enumerate(self.string_pool) if index not in unused
+            ]
+            string_indexes = {}
+            for index, key in enumerate(string_pool):
+                string_indexes.setdefault(key, index)
+
+            if min(unused) < len(string_pool):
+                # Unused keys aren't referenced, their index doesn't matter
+                new_indexes = [
+                    string_indexes.get(key, 0) for key in self.string_pool
+                ]
+                chunks = [self.appinfoData[:self.get_apps_start()]]
+                for app_id, start, end in spans:
+                    data = self.translate_keys(
+                        self.appinfoData[start:end],
+                        APP_HEADER_SIZE,
+                        new_indexes.__getitem__,
+                    )
+                    checksum_binary = sha1(data[APP_HEADER_SIZE:]).digest()
+                    data[APP_HEADER_SIZE - 20:APP_HEADER_SIZE] = checksum_binary
+                    if dict.__contains__(self.parsedAppInfo, app_id):
+                        self.parsedAppInfo[app_id]["checksum_binary"] = checksum_binary
+                    self.rewritten_apps.add(app_id)
+                    chunks.append(data)
+
+            # Sections decoded with the old pool get translated when
+            # they're encoded again
+            self.string_pool = string_pool
+            self.string_indexes = string_indexes
+
+        # The last appid, 0, goes right before the string table
+        self.string_offset = apps_end + 4
+        chunks.append(self.encode_uint32(0))
+        chunks.append(self.encode_uint32(len(self.string_pool)))
+        for key in self.string_pool:
+            if key in self.latin1_keys:
+                chunks.append(key.encode("latin-1") + self.SEPARATOR)
+            else:
+                chunks.append(key.encode() + self.SEPARATOR)
+        self.appinfoData = bytearray().join(chunks)
+        self.appinfoData[8:16] = self.encode_int64(self.string_offset)
+
+        self.dropped_keys = set()
+        self.checked_pool_size = len(self.string_pool)
+
+    def update_app(self, app_id):
+        self.update_apps([app_id], jobs=1)
+
+    def update_apps(self, app_ids, jobs=None):
+        """
+        Encodes the given apps and writes them into appinfoData, updating
+        their size and checksums.
+        """
+        self.splice_apps(self.encode_apps(app_ids), jobs)
+
+    def encode_apps(self, app_ids):
+        """
+        Encodes the given apps one after the other, since that may add
+        keys to the string table. Returns a dictionary mapping every
+        appid to its binary and text encoded data, which don't depend on
+        the sections anymore, so they can be given to splice_apps while
+        the sections are being edited.
+        """
+        encoded_apps = {}
+        for app_id in dict.fromkeys(app_ids):
+            sections = self.parsedAppInfo[app_id]["sections"]
+            encoded_apps[app_id] = (
+                self.encode_subsections(sections),
+                self.dict_to_text_vdf(sections),
+            )
+        return encoded_apps
+
+    def splice_apps(self, encoded_apps, jobs=None, progress=None):
+        """
+        Writes apps encoded by encode_apps into appinfoData, updating
+        their size and checksums. Checksums are calculated in a pool of
+        jobs threads (hashlib releases the GIL), and the data is then put
+        together in a single pass instead of moving the rest of the file
+        once per app. progress, if given, is called with the number of
+        hashed apps and the total after each one.
+        """
+        if not encoded_apps:
+            return
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            hashes = {
+                app_id: (
+                    executor.submit(sha1, formatted_data),
+                    executor.submit(sha1, encoded_subsections),
+                )
+                for app_id, (encoded_subsections, formatted_data) in encoded_apps.items()
+            }
+
+            for count, (app_id, (text_hash, binary_hash)) in enumerate(hashes.items(), 1):
+                # appid and size fields don't count towards the total of the
+                # size field, so we skip them by removing 8 bytes from the
+                # header size
+                size = len(encoded_apps[app_id][0]) + APP_HEADER_SIZE - 8
+                self.parsedAppInfo[app_id] = self.update_header_size_and_checksums(
+                    self.parsedAppInfo[app_id],
+                    size,
+                    text_hash.result().digest(),
+                    binary_hash.result().digest(),
+                )
+                if progress is not None:
+                    progress(count, len(hashes))
+
+        # Apps are taken out as they are placed
+        encoded_apps = dict(encoded_apps)
+        chunks = []
+        position = 0
+        apps_end = self.get_apps_start()
+        with memoryview(self.appinfoData) as data:
+            for app_id, start, end in self.iter_app_spans():
+                apps_end = end
+                if app_id in encoded_apps:
+                    self.rewritten_apps.add(app_id)
+                    self.drop_keys(
+                        self.appinfoData[start + APP_HEADER_SIZE:end],
+                        encoded_apps[app_id][0],
+                    )
+                    chunks.append(data[position:start])
+                    chunks.append(self.encode_header(self.parsedAppInfo[app_id]))
+                    chunks.append(encoded_apps.pop(app_id)[0])
+                    position = end
+
+            # Apps that weren't in the file go after the last one, right
+            # before the appid 0 that ends the list
+            chunks.append(data[position:apps_end])
+            for app_id, (encoded_subsections, formatted_data) in encoded_apps.items():
+                self.rewritten_apps.add(app_id)
+                chunks.append(self.encode_header(self.parsedAppInfo[app_id]))
+                chunks.append(encoded_subsections)
+            chunks.append(data[apps_end:])
+
+            appinfoData = bytearray().join(chunks)
+            chunks = None
+
+        self.appinfoData = appinfoData
+        # Apps after the updated ones may have moved
+        self.app_offsets = None
+
+    def validate_data(self):
+        """
+        Checks appinfoData right before it's written: the app boundaries
+        and the string table, which only takes a walk over the headers,
+        and the checksums of the apps rewritten since the last write.
+        Raises CorruptedDataError so a broken file never gets written.
+        """
+        report = {"corrupt": [], "errors": []}
+        spans = check_layout(self.appinfoData, report)
+        rewritten = [span for span in spans if span[0] in self.rewritten_apps]
+        report["corrupt"].extend(
+            (app_id, "checksum_binary doesn't match")
+            for app_id in check_checksums(self.appinfoData, rewritten)
+        )
+        if report["corrupt"] or report["errors"]:
+            raise CorruptedDataError(
+                "; ".join(
+                    [f"{app_id}: {reason}" for app_id, reason in report["corrupt"]]
+                    + report["errors"]
+                )
+            )
+        self.rewritten_apps = set()
 
     def write_data(self):
         if self.version == APPINFO_29:
-            self.update_string_offset_and_count()
+            self.rebuild_string_table()
+        self.validate_data()
         with open(self.vdf_path, "wb") as vdf:
             vdf.write(self.appinfoData)
 
@@ -322,6 +1164,16 @@ class Appinfo:
         Formats a Python dictionary into the vdf text format.
         """
 
+        # Only the outermost unmodified section keeps its text, its
+        # children would just hold copies of parts of it
+        cache_text = (
+            isinstance(data, Section)
+            and data.span is not None
+            and (data.parent is None or data.parent.span is None)
+        )
+        if cache_text and data.text is not None and data.text[0] == number_of_tabs:
+            return data.text[1]
+
         formatted_data = b""
         # Set a string with a fixed number of tabs for this instance
         tabs = b"\t" * number_of_tabs
@@ -376,4 +1228,6 @@ class Appinfo:
                         + b"\n"
                     )
 
+        if cache_text:
+            data.text = (number_of_tabs, formatted_data)
         return formatted_data
@@ -0,0 +1,185 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import os
+from copy import copy
+from threading import Event, Thread
+
+from appinfo import APPINFO_29, APP_HEADER_SIZE, copy_sections
+
+
+class SaveCancelled(Exception):
+    pass
+
+
+class BackgroundSave(Thread):
+    """
+    Writes the modifications JSON and appinfo.vdf in a thread. The
+    sections of the modified apps are copied when the save is created,
+    on the thread that edits them, and everything else, encoding the
+    apps and the JSON included, works on a snapshot, so apps can keep
+    being edited while saving; those edits go in the next save.
+
+    modifications is the data of modifications.json, its "modified"
+    trees are replaced by the copies.
+
+    Both files are written next to the real ones and only renamed over
+    them at the end, so a save can be cancelled, or fail, without
+    leaving anything half written. Once it's done, apply puts the new
+    data back in the appinfo it was created from.
+    """
+
+    def __init__(self, appinfo, app_ids, modifications, modifications_path, jobs=None):
+        super().__init__(daemon=True)
+        self.vdf_path = appinfo.vdf_path
+        self.modifications_path = modifications_path
+        self.jobs = jobs
+
+        self.app_ids = list(dict.fromkeys(app_ids))
+        sections = {
+            app_id: copy_sections(appinfo.parsedAppInfo[app_id]["sections"])
+            for app_id in self.app_ids
+        }
+        self.modifications = {
+            app: dict(data, modified=sections[int(app)]) if int(app) in sections else data
+            for app, data in modifications.items()
+        }
+
+        self.pool_size = len(appinfo.string_pool)
+        self.snapshot = copy(appinfo)
+        # appinfoData is copied by the thread, nothing changes it while
+        # saving since the actions that do wait for the save to finish
+        self.snapshot.string_pool = self.string_pool = list(appinfo.string_pool)
+        self.snapshot.string_indexes = None
+        self.snapshot.dropped_keys = set(appinfo.dropped_keys)
+        self.snapshot.rewritten_apps = set(appinfo.rewritten_apps)
+        self.snapshot.app_offsets = None
+        self.snapshot.parsedAppInfo = {
+            app_id: {
+                key: value
+                for key, value in appinfo.parsedAppInfo[app_id].items()
+                if key != "sections"
+            }
+            for app_id in self.app_ids
+        }
+        for app_id, app_sections in sections.items():
+            self.snapshot.parsedAppInfo[app_id]["sections"] = app_sections
+
+        self.cancelled = Event()
+        self.status = "Saving..."
+        self.saved = False
+        self.error = None
+
+    def cancel(self):
+        # Has no effect once the files started being renamed
+        self.cancelled.set()
+
+    def check_cancelled(self):
+        if self.cancelled.is_set():
+            raise SaveCancelled()
+
+    def report_progress(self, count, total):
+        self.status = f"Saving... {count * 100 // total}%"
+        self.check_cancelled()
+
+    def run(self):
+        temp_paths = []
+        try:
+            self.status = "Encoding..."
+            self.snapshot.appinfoData = bytes(self.snapshot.appinfoData)
+            encoded_apps = self.snapshot.encode_apps(self.app_ids)
+            # apply only takes the headers back
+            for app_id in self.app_ids:
+                del self.snapshot.parsedAppInfo[app_id]["sections"]
+            modifications = json.dumps(self.modifications, indent=2)
+            self.modifications = None
+            self.check_cancelled()
+
+            self.snapshot.splice_apps(encoded_apps, self.jobs, self.report_progress)
+            encoded_apps = None
+
+            self.status = "Writing..."
+            if self.snapshot.version == APPINFO_29:
+                self.snapshot.rebuild_string_table()
+            self.snapshot.validate_data()
+            temp_paths.append(f"{self.modifications_path}.tmp")
+            with open(temp_paths[-1], "w") as mod:
+                mod.write(modifications)
+            self.check_cancelled()
+            temp_paths.append(f"{self.vdf_path}.tmp")
+            with open(temp_paths[-1], "wb") as vdf:
+                vdf.write(self.snapshot.appinfoData)
+            self.check_cancelled()
+
+            os.replace(temp_paths[0], self.modifications_path)
+            os.replace(temp_paths[1], self.vdf_path)
+            temp_paths = []
+            self.saved = True
+        except SaveCancelled:
+            pass
+        except Exception as error:
+            self.error = error
+        finally:
+            for path in temp_paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def apply(self, appinfo):
+        """
+        Puts the saved data in appinfo. Must be called from the thread
+        that edits the apps, after the save finished.
+        """
+        appinfo.appinfoData = self.snapshot.appinfoData
+        if not isinstance(appinfo.appinfoData, bytearray):
+            # Nothing was spliced into the snapshot
+            appinfo.appinfoData = bytearray(appinfo.appinfoData)
+        appinfo.app_offsets = None
+        appinfo.string_offset = self.snapshot.string_offset
+        appinfo.dropped_keys = self.snapshot.dropped_keys
+        appinfo.rewritten_apps = self.snapshot.rewritten_apps
+        appinfo.checked_pool_size = self.snapshot.checked_pool_size
+
+        added_keys = appinfo.string_pool[self.pool_size:]
+        compacted = self.snapshot.string_pool is not self.string_pool
+        if compacted or added_keys:
+            # The saved data uses the string pool of the snapshot: unused
+            # keys were taken out of it, which changed the key indices
+            # and checksum_binary of the apps, or keys were added here
+            # while saving, so both pools have different keys at the
+            # same indices. Keys added here go after the ones of the
+            # snapshot.
+            appinfo.string_pool = self.snapshot.string_pool
+            appinfo.string_indexes = self.snapshot.string_indexes
+            for key in added_keys:
+                appinfo.get_key_index(key)
+        else:
+            # Keys added by encoding the apps get the same indices they
+            # have in the snapshot
+            for key in self.string_pool[self.pool_size:]:
+                appinfo.get_key_index(key)
+
+        if compacted:
+            for app_id in dict.keys(appinfo.parsedAppInfo):
+                start, end = appinfo.get_app_span(app_id)
+                appinfo.parsedAppInfo[app_id]["checksum_binary"] = bytes(
+                    appinfo.appinfoData[start + APP_HEADER_SIZE - 20:start + APP_HEADER_SIZE]
+                )
+
+        for app_id, header in self.snapshot.parsedAppInfo.items():
+            appinfo.parsedAppInfo[app_id].update(header)
@@ -0,0 +1,218 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+from hashlib import sha1
+from struct import pack, unpack
+
+from appinfo import APPINFO_29, APP_HEADER_SIZE
+
+
+STORE_MAGIC = b"SMEORIG\x00"
+# Magic and appinfo.vdf version
+STORE_HEADER_SIZE = 16
+# appid, number of keys, size of the keys and size of the app
+RECORD_HEADER_SIZE = 16
+
+
+class OriginalStore:
+    """
+    Keeps the original bytes (header and body) of every modified app in
+    a binary file next to the modifications, so apps can be reverted by
+    splicing those bytes back into appinfo.vdf.
+
+    On APPINFO_29 the key indices of an app only make sense with the
+    string table of the file they came from, so they are stored
+    relative to a list of keys saved with the app, and translated back
+    to the current string table when the app is restored.
+
+    Records are only ever appended, a newer record for the same app
+    replaces the older one. Removing apps rewrites the file.
+
+    Records are saved with the version of appinfo.vdf in the file
+    header. When it changes, a record for appid 0, which no app has,
+    holds the version of the records after it, so apps saved from the
+    previous version are kept. They can only be restored into a file of
+    the same version.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Version new records are saved with
+        self.version = None
+        # appid -> offset of its latest record
+        self.records = {}
+        # appid -> version of its latest record
+        self.versions = {}
+        self.stale_size = 0
+        self.load_index()
+
+    def __contains__(self, app_id):
+        return app_id in self.records
+
+    def load_index(self):
+        try:
+            with open(self.path, "rb") as store:
+                header = store.read(STORE_HEADER_SIZE)
+                if len(header) < STORE_HEADER_SIZE or header[:8] != STORE_MAGIC:
+                    return
+                self.version = unpack("<Q", header[8:])[0]
+
+                offset = STORE_HEADER_SIZE
+                while True:
+                    record_header = store.read(RECORD_HEADER_SIZE)
+                    if len(record_header) < RECORD_HEADER_SIZE:
+                        break
+                    app_id, key_count, keys_size, data_size = unpack(
+                        "<4I", record_header
+                    )
+                    record_size = RECORD_HEADER_SIZE + keys_size + data_size
+                    if app_id == 0:
+                        self.version = unpack("<Q", store.read(data_size))[0]
+                    else:
+                        if app_id in self.records:
+                            self.stale_size += record_size
+                        self.records[app_id] = offset
+                        self.versions[app_id] = self.version
+                    offset += record_size
+                    store.seek(offset)
+        except FileNotFoundError:
+            pass
+
+    def encode_record(self, app_id, data, keys):
+        encoded_keys = b"".join(key.encode() + b"\x00" for key in keys)
+        return (
+            pack("<4I", app_id, len(keys), len(encoded_keys), len(data))
+            + encoded_keys
+            + data
+        )
+
+    def read_record(self, store, offset):
+        store.seek(offset)
+        app_id, key_count, keys_size, data_size = unpack(
+            "<4I", store.read(RECORD_HEADER_SIZE)
+        )
+        encoded_keys = store.read(keys_size)
+        keys = [key.decode() for key in encoded_keys.split(b"\x00")[:key_count]]
+        return app_id, store.read(data_size), keys
+
+    def save(self, appinfo, app_id):
+        """
+        Stores the current bytes of an app as its original data.
+        """
+        data = appinfo.get_app_bytes(app_id)
+        keys = []
+        if appinfo.version == APPINFO_29:
+            local_indexes = {}
+
+            def to_local_index(index):
+                if index not in local_indexes:
+                    local_indexes[index] = len(keys)
+                    keys.append(appinfo.string_pool[index])
+                return local_indexes[index]
+
+            data = appinfo.translate_keys(data, APP_HEADER_SIZE, to_local_index)
+
+        if self.version != appinfo.version and not self.records:
+            self.version = appinfo.version
+            self.rewrite({})
+
+        with open(self.path, "ab") as store:
+            if self.version != appinfo.version:
+                self.version = appinfo.version
+                store.write(self.encode_version(self.version))
+            offset = store.tell()
+            store.write(self.encode_record(app_id, data, keys))
+        if app_id in self.records:
+            self.stale_size += self.get_record_size(self.records[app_id])
+        self.records[app_id] = offset
+        self.versions[app_id] = self.version
+
+        # Compact the file once most of it is replaced records
+        if self.stale_size > offset / 2:
+            self.rewrite(self.records)
+
+    def load(self, appinfo, app_id):
+        """
+        Returns the original bytes of an app, ready to be put back in
+        the given appinfo, or None if they aren't available.
+        """
+        if self.versions.get(app_id) != appinfo.version:
+            return None
+
+        with open(self.path, "rb") as store:
+            app_id, data, keys = self.read_record(store, self.records[app_id])
+
+        if appinfo.version == APPINFO_29:
+            data = appinfo.translate_keys(
+                data, APP_HEADER_SIZE, lambda index: appinfo.get_key_index(keys[index])
+            )
+            # The body only stays the same if the string table didn't
+            # change, so its checksum is calculated again
+            data[48:68] = sha1(data[APP_HEADER_SIZE:]).digest()
+
+        return bytes(data)
+
+    def get_record_size(self, offset):
+        with open(self.path, "rb") as store:
+            store.seek(offset)
+            key_count, keys_size, data_size = unpack(
+                "<3I", store.read(RECORD_HEADER_SIZE)[4:]
+            )
+        return RECORD_HEADER_SIZE + keys_size + data_size
+
+    def remove(self, app_ids):
+        remaining = {
+            app_id: offset
+            for app_id, offset in self.records.items()
+            if app_id not in app_ids
+        }
+        if len(remaining) != len(self.records):
+            self.rewrite(remaining)
+
+    def encode_version(self, version):
+        # Record for appid 0 with the version of the records after it
+        return pack("<4IQ", 0, 0, 0, 8, version)
+
+    def rewrite(self, records):
+        # Writes a new file with only the given records, dropping the
+        # ones that were replaced or removed. Records of other versions
+        # go first, so the file ends with the current one.
+        temp_path = f"{self.path}.tmp"
+        new_records = {}
+        order = sorted(
+            records, key=lambda app_id: self.versions[app_id] == self.version
+        )
+        version = self.versions[order[0]] if order else self.version
+        with open(temp_path, "wb") as new_store:
+            new_store.write(STORE_MAGIC + pack("<Q", version or 0))
+            if records:
+                with open(self.path, "rb") as store:
+                    for app_id in order:
+                        if self.versions[app_id] != version:
+                            version = self.versions[app_id]
+                            new_store.write(self.encode_version(version))
+                        new_records[app_id] = new_store.tell()
+                        new_store.write(
+                            self.encode_record(*self.read_record(store, records[app_id]))
+                        )
+            if version != self.version:
+                new_store.write(self.encode_version(self.version))
+        os.replace(temp_path, self.path)
+
+        self.records = new_records
+        self.versions = {app_id: self.versions[app_id] for app_id in new_records}
+        self.stale_size = 0
@@ -0,0 +1,310 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import re
+import csv
+import json
+from json import JSONDecodeError
+
+from appinfo import Appinfo
+from backups import OriginalStore
+from catalog import Catalog, get_unix_time
+
+
+# Transforms a rule can have, exactly one per rule
+ACTIONS = ("set", "copy", "replace", "regex", "strip", "case")
+CASES = {"lower": str.lower, "upper": str.upper, "title": str.title}
+
+INTEGER_REGEX = re.compile(r"-?[0-9]+")
+DATE_REGEX = re.compile(r"([0-9]{4})-([0-9]{2})-([0-9]{2})")
+
+
+class BulkEditError(Exception):
+    pass
+
+
+class Rule:
+    """
+    Changes the value of a key path (relative to the appinfo section,
+    e.g. "common/name") of every app it applies to. Rules are written
+    as a dictionary with the path, one of the ACTIONS and optionally
+    "apps", a list of appids, and "match", a dictionary of key paths to
+    regular expressions their values must contain.
+    """
+
+    def __init__(self, rule):
+        try:
+            self.path = rule["path"]
+        except (KeyError, TypeError):
+            raise BulkEditError(f"Rule without a path: {rule!r}")
+
+        actions = [action for action in ACTIONS if action in rule]
+        if len(actions) != 1:
+            raise BulkEditError(
+                f"Rule for {self.path} needs exactly one of: " + ", ".join(ACTIONS)
+            )
+        self.action = actions[0]
+        self.argument = rule[self.action]
+
+        try:
+            if self.action in ("replace", "regex"):
+                old, new = self.argument
+                if self.action == "regex":
+                    old = re.compile(old)
+                self.argument = (old, new)
+            elif self.action == "case":
+                self.argument = CASES[self.argument]
+            self.match = [
+                (path, re.compile(pattern))
+                for path, pattern in rule.get("match", {}).items()
+            ]
+        except (ValueError, TypeError, KeyError, re.error) as error:
+            raise BulkEditError(f"Invalid rule for {self.path}: {error}")
+
+        apps = rule.get("apps")
+        self.apps = None if apps is None else {int(app) for app in apps}
+
+    def get_paths(self):
+        paths = [self.path] + [path for path, pattern in self.match]
+        if self.action == "copy":
+            paths.append(self.argument)
+        return paths
+
+    def applies_to(self, app_id, values):
+        if self.apps is not None and app_id not in self.apps:
+            return False
+        for path, pattern in self.match:
+            value = values.get(path)
+            if value is None or not pattern.search(str(value)):
+                return False
+        return True
+
+    def transform(self, values):
+        # Returns the new value, or None if there's nothing to change
+        value = values.get(self.path)
+        if self.action == "set":
+            return self.argument
+        if self.action == "copy":
+            return values.get(self.argument)
+        if not isinstance(value, str):
+            return None
+        if self.action == "replace":
+            return value.replace(*self.argument)
+        if self.action == "regex":
+            pattern, replacement = self.argument
+            return pattern.sub(replacement, value)
+        if self.action == "strip":
+            return value.strip(None if self.argument is True else self.argument)
+        return self.argument(value)
+
+
+class BulkEdit:
+    """
+    A list of rules, applied in order, followed by a mapping of appids
+    to the values some of their key paths are set to. With text_mapping
+    the values are CSV cells, see get_csv_value.
+    """
+
+    def __init__(self, rules=(), mapping=None, text_mapping=False):
+        self.rules = [Rule(rule) for rule in rules]
+        self.mapping = mapping or {}
+        self.text_mapping = text_mapping
+
+    def get_paths(self):
+        paths = {}
+        for rule in self.rules:
+            paths.update(dict.fromkeys(rule.get_paths()))
+        for values in self.mapping.values():
+            paths.update(dict.fromkeys(values))
+        return list(paths)
+
+    def get_apps(self):
+        # The only apps that can change, or None if any app can
+        if any(rule.apps is None for rule in self.rules):
+            return None
+        apps = set(self.mapping)
+        for rule in self.rules:
+            apps |= rule.apps
+        return apps
+
+    def apply(self, app_id, values):
+        """
+        Runs every rule and mapping that applies to the app over the
+        given values (key path to value, missing paths left out).
+        Returns the paths whose value changed, with their new value.
+        """
+        new_values = dict(values)
+        for rule in self.rules:
+            if rule.applies_to(app_id, new_values):
+                value = rule.transform(new_values)
+                if value is not None:
+                    new_values[rule.path] = value
+        for path, value in self.mapping.get(app_id, {}).items():
+            if self.text_mapping:
+                value = get_csv_value(value, new_values.get(path))
+            new_values[path] = value
+
+        return {
+            path: value
+            for path, value in new_values.items()
+            if path not in values or values[path] != value
+        }
+
+
+def get_path(data, path):
+    for key in path.split("/"):
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+def parse_csv_value(text):
+    # YYYY-MM-DD dates are stored as timestamps, like the dates entered
+    # in the editor, anything else is left as text until it's applied
+    date = DATE_REGEX.fullmatch(text)
+    if date:
+        return get_unix_time(*(int(part) for part in date.groups()))
+    return text
+
+
+def get_csv_value(value, current):
+    # Numbers are only stored as integers for keys already holding one,
+    # so strings that look like numbers, like a sortas of "007", keep
+    # their type and their leading zeros
+    if (
+        isinstance(value, str)
+        and isinstance(current, int)
+        and INTEGER_REGEX.fullmatch(value)
+        and -2**31 <= int(value) < 2**31
+    ):
+        return int(value)
+    return value
+
+
+def read_csv_mapping(path):
+    # The first column holds the appids, the header row the key paths
+    mapping = {}
+    with open(path, "r", newline="", encoding="utf-8") as mapping_file:
+        rows = csv.reader(mapping_file)
+        header = next(rows, None)
+        if not header:
+            raise BulkEditError(f"{path} is empty")
+        for row in rows:
+            if not row or not row[0].strip():
+                continue
+            values = {
+                key_path: parse_csv_value(value)
+                for key_path, value in zip(header[1:], row[1:])
+                if value != ""
+            }
+            mapping.setdefault(int(row[0]), {}).update(values)
+    return mapping
+
+
+def load_bulk_edit(path):
+    """
+    Reads a bulk edit from a CSV mapping, or a JSON file with either a
+    list of rules, an object with the list of "rules" (and optionally a
+    "mapping"), or just a mapping of appids to key paths and values.
+    """
+    try:
+        if path.lower().endswith(".csv"):
+            return BulkEdit(mapping=read_csv_mapping(path), text_mapping=True)
+
+        with open(path, "r", encoding="utf-8") as edit_file:
+            data = json.load(edit_file)
+        if isinstance(data, list):
+            return BulkEdit(data)
+        if "rules" in data:
+            mapping = data.get("mapping", {})
+            return BulkEdit(
+                data["rules"],
+                {int(app): values for app, values in mapping.items()},
+            )
+        return BulkEdit(mapping={int(app): values for app, values in data.items()})
+    except (JSONDecodeError, ValueError, AttributeError, TypeError) as error:
+        raise BulkEditError(f"Invalid bulk edit file {path}: {error}")
+
+
+def bulk_edit_appinfo(vdf_path, edit, modifications_path, originals_path, jobs=None):
+    """
+    Applies a bulk edit to appinfo.vdf. The fields the edit needs are
+    read in a single scan, without decoding whole apps, and only the
+    apps that change get decoded. Apps that were already modified are
+    edited from their modified data. Changes are recorded in the
+    modifications JSON like the ones made in the editor, and
+    appinfo.vdf is written once.
+
+    Returns the edited appids and the number of apps scanned.
+    """
+    try:
+        with open(modifications_path, "r") as mod:
+            jsonData = json.load(mod)
+    except (FileNotFoundError, JSONDecodeError):
+        jsonData = {}
+    modified = {
+        int(app): data["modified"] for app, data in jsonData.items() if "modified" in data
+    }
+
+    appinfo = Appinfo(vdf_path, lazy=True)
+    paths = edit.get_paths()
+    changes = {}
+    scanned = 0
+    for app_id, fields in appinfo.iter_fields(
+        [f"appinfo/{path}" for path in paths], edit.get_apps()
+    ):
+        scanned += 1
+        if app_id in modified:
+            values = {}
+            for path in paths:
+                value = get_path(modified[app_id].get("appinfo", {}), path)
+                if value is not None:
+                    values[path] = value
+        else:
+            values = {
+                path[len("appinfo/"):]: value for path, value in fields.items()
+            }
+
+        changed = edit.apply(app_id, values)
+        if changed:
+            changes[app_id] = changed
+
+    originals = OriginalStore(originals_path)
+
+    def save_original_data(app_id):
+        # Apps that were already modified keep their original data
+        if str(app_id) not in jsonData:
+            originals.save(appinfo, app_id)
+            jsonData[str(app_id)] = {}
+
+    catalog = Catalog(appinfo, {}, list(modified), save_original_data)
+    for app_id, changed in changes.items():
+        if app_id in modified:
+            appinfo.parsedAppInfo[app_id]["sections"] = modified[app_id]
+        for path, value in changed.items():
+            catalog.set_data(app_id, value, *path.split("/"))
+        jsonData[str(app_id)]["modified"] = appinfo.parsedAppInfo[app_id]["sections"]
+
+    if changes:
+        # appinfo.vdf goes first, the modifications are only recorded
+        # once they were written
+        appinfo.update_apps(changes, jobs)
+        appinfo.write_data()
+        with open(modifications_path, "w") as mod:
+            json.dump(jsonData, mod, indent=2)
+
+    return list(changes), scanned
@@ -0,0 +1,285 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from datetime import datetime
+
+from edit_history import MISSING, EditHistory
+
+
+# Columns the app list can be sorted by, and their index in its rows
+SORT_COLUMNS = {"name": 0, "type": 1, "modified": 2, "appid": 3}
+
+
+def get_unix_time(year, month, day):
+    return int(datetime(year, month, day).timestamp())
+
+
+def validate_date(year, month, day):
+    if len(str(year)) > 4 or year < 1970:
+        return False
+    try:
+        if datetime(year, month, day) > datetime.today():
+            return False
+    except ValueError:
+        return False
+
+    return True
+
+
+class Catalog:
+    """
+    The apps shown by the editor and every edit made to them, without
+    anything from Tk, so it can be driven and timed without a display.
+
+    appinfo only needs a parsedAppInfo mapping of appids to apps with a
+    "sections" key. app_fields maps every appid to the fields shown in
+    the list, as returned by Appinfo.iter_fields. on_first_edit is called
+    with the appid before an app is modified for the first time.
+
+    Edits are recorded in history, so they can be undone and redone.
+    """
+
+    def __init__(self, appinfo, app_fields, modified_apps=None, on_first_edit=None):
+        self.appinfo = appinfo
+        self.app_fields = app_fields
+        self.modified_apps = modified_apps if modified_apps is not None else []
+        self.on_first_edit = on_first_edit
+        # [name, type, modified, appid] of every app in the list
+        self.app_list = []
+        # Column -> sort key of every row, and the row indexes sorted by
+        # it, worked out the first time they're needed after a rebuild
+        self.sort_keys = {}
+        self.sort_orders = {}
+        self.history = EditHistory(self.apply_change)
+
+    def get_data(self, app_id, *sections, error=""):
+        data = self.appinfo.parsedAppInfo[app_id]["sections"]["appinfo"]
+        for section in sections:
+            try:
+                data = data[section]
+            except KeyError:
+                return error
+
+        return data
+
+    def mark_modified(self, app_id):
+        if app_id not in self.modified_apps:
+            if self.on_first_edit is not None:
+                self.on_first_edit(app_id)
+            self.modified_apps.append(app_id)
+
+    def set_data(self, app_id, value, *sections):
+        app_id = int(app_id)
+        self.mark_modified(app_id)
+
+        data = self.appinfo.parsedAppInfo[app_id]["sections"]["appinfo"]
+        # Access all but the last element
+        for depth, section in enumerate(sections[0:len(sections) - 1]):
+            if section not in data:
+                # Missing sections are created with the value in them,
+                # and all of them are added as a single change
+                new_data = value
+                for key in reversed(sections[depth + 1:]):
+                    new_data = {key: new_data}
+                self.history.record(
+                    app_id, ("set", sections[:depth + 1], MISSING, new_data)
+                )
+                data[section] = new_data
+                return
+            data = data[section]
+
+        self.history.record(
+            app_id, ("set", sections, data.get(sections[-1], MISSING), value)
+        )
+        data[sections[-1]] = value
+
+    def apply_change(self, app_id, kind, path, value):
+        # Puts back a value recorded in history
+        data = self.get_data(app_id, *path[:-1])
+        if kind == "items":
+            data = data[path[-1]]
+            data.clear()
+            data.update(value)
+        elif value is MISSING:
+            del data[path[-1]]
+        else:
+            data[path[-1]] = value
+
+    def undo(self):
+        # Returns the appid of the app that changed, or None
+        return self.history.undo()
+
+    def redo(self):
+        return self.history.redo()
+
+    def get_app_details(self, app_id):
+        """
+        Returns the values shown in the editor for an app, with the
+        release dates as datetimes.
+        """
+        name = self.get_data(app_id, "common", "name")
+        sort_as = self.get_data(app_id, "common", "sortas")
+        steam_release_date = self.get_data(app_id, "common", "steam_release_date")
+        og_release_date = self.get_data(app_id, "common", "original_release_date")
+
+        if not steam_release_date:
+            steam_release_date = 0
+        if not og_release_date:
+            og_release_date = steam_release_date
+
+        return {
+            "name": name,
+            "sortas": sort_as or name,
+            "developer": self.get_data(app_id, "extended", "developer"),
+            "publisher": self.get_data(app_id, "extended", "publisher"),
+            "steam_release_date": datetime.fromtimestamp(steam_release_date),
+            "original_release_date": datetime.fromtimestamp(og_release_date),
+        }
+
+    def set_developer(self, app_id, developer):
+        with self.history.group():
+            self.set_data(app_id, developer, "extended", "developer")
+            self.set_data(app_id, developer, "common", "associations", "0", "name")
+
+    def set_publisher(self, app_id, publisher):
+        with self.history.group():
+            self.set_data(app_id, publisher, "extended", "publisher")
+            self.set_data(app_id, publisher, "common", "associations", "1", "name")
+
+    def set_timestamp(self, app_id, key, year, month, day):
+        """
+        Sets a date key (steam_release_date or original_release_date)
+        of an app. Returns False if the date isn't valid.
+        """
+        if not validate_date(year, month, day):
+            return False
+        self.set_data(app_id, get_unix_time(year, month, day), "common", key)
+        return True
+
+    def build_app_list(self):
+        """
+        Gathers every app with a name and a type, sorted by name
+        case-insensitively.
+        """
+        self.app_list = []
+        self.sort_keys = {}
+        self.sort_orders = {}
+
+        for app_id, fields in list(self.app_fields.items())[2:]:
+            # Apps that were already decoded may have been edited
+            if app_id in self.appinfo.parsedAppInfo:
+                app_type = self.get_data(app_id, "common", "type")
+                app_name = self.get_data(app_id, "common", "name")
+            else:
+                app_type = fields.get("appinfo/common/type", "")
+                app_name = fields.get("appinfo/common/name", "")
+            if app_name and app_type:
+                modified = app_id in self.modified_apps
+                self.app_list.append([str(app_name), app_type, modified, app_id])
+
+        # Sort case-insensitive
+        self.app_list.sort(key=lambda x: x[0].casefold())
+        return self.app_list
+
+    def get_sort_keys(self, column):
+        keys = self.sort_keys.get(column)
+        if keys is None:
+            index = SORT_COLUMNS[column]
+            if column in ("name", "type"):
+                keys = [str(app[index]).casefold() for app in self.app_list]
+            else:
+                keys = [app[index] for app in self.app_list]
+            self.sort_keys[column] = keys
+        return keys
+
+    def get_sort_order(self, column):
+        """
+        Returns the indexes of the rows of app_list sorted by a column.
+        app_list is sorted by name already, so rows with the same value
+        stay sorted by name.
+        """
+        order = self.sort_orders.get(column)
+        if order is None:
+            if column == "name":
+                order = range(len(self.app_list))
+            else:
+                order = sorted(
+                    range(len(self.app_list)), key=self.get_sort_keys(column).__getitem__
+                )
+            self.sort_orders[column] = order
+        return order
+
+    def search(self, query, column="name", reverse=False):
+        """
+        Apps in the list whose name contains the query, or every app if
+        there's no query, sorted by a column of SORT_COLUMNS.
+        """
+        order = self.get_sort_order(column)
+        if reverse:
+            order = reversed(order)
+        if not query:
+            return [self.app_list[index] for index in order]
+
+        query = query.casefold()
+        names = self.get_sort_keys("name")
+        return [self.app_list[index] for index in order if query in names[index]]
+
+    def renumber_launch_options(self, app_id, order):
+        """
+        Rebuilds the launch options of an app with the given option
+        numbers, in that order, numbered again from 0. It's done on the
+        launch options in place, in a single pass.
+        """
+        app_id = int(app_id)
+        self.mark_modified(app_id)
+        launch_options = self.get_data(app_id, "config", "launch")
+        options = [launch_options[number] for number in order]
+        new_items = [(str(number), option) for number, option in enumerate(options)]
+        self.history.record(
+            app_id, ("items", ("config", "launch"), list(launch_options.items()), new_items)
+        )
+        launch_options.clear()
+        launch_options.update(new_items)
+
+    def move_launch_option(self, app_id, option_number, direction):
+        """
+        Swaps a launch option with the one above or below it. Returns
+        False if there's no option to swap with.
+        """
+        numbers = list(self.get_data(app_id, "config", "launch"))
+        index = numbers.index(option_number)
+        if direction == "up":
+            new_index = index - 1
+        elif direction == "down":
+            new_index = index + 1
+        else:
+            return False
+        if not 0 <= new_index < len(numbers):
+            return False
+
+        numbers[index], numbers[new_index] = numbers[new_index], numbers[index]
+        self.renumber_launch_options(app_id, numbers)
+        return True
+
+    def delete_launch_option(self, app_id, option_number):
+        # Every option after the deleted one moves a number down
+        numbers = list(self.get_data(app_id, "config", "launch"))
+        numbers.remove(option_number)
+        self.renumber_launch_options(app_id, numbers)
+
+    def add_launch_option(self, app_id):
+        launch_options = self.get_data(app_id, "config", "launch")
+        self.set_data(app_id, {}, "config", "launch", str(len(launch_options)))
@@ -0,0 +1,199 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Replays scripted edit and search sessions against a synthetic catalog
+# and reports the latency of every kind of operation, e.g.
+#
+#     python catalog_benchmark.py --apps 100000 --steps 5000
+
+import random
+from argparse import ArgumentParser
+from time import perf_counter
+
+from catalog import SORT_COLUMNS, Catalog
+
+
+WORDS = [
+    "dark", "souls", "space", "legend", "tales", "quest", "city", "war",
+    "star", "craft", "age", "empire", "ghost", "island", "racing", "simulator",
+    "tower", "defense", "dungeon", "hero", "night", "shadow", "world", "zero",
+]
+APP_TYPES = ["Game", "Application", "Tool", "Demo", "DLC"]
+OPERATIONS = [
+    "search", "select", "rename", "developer", "timestamp",
+    "add_launch", "move_launch", "delete_launch", "rebuild", "undo", "redo",
+    "sort",
+]
+
+
+class SyntheticAppinfo:
+    # Just enough of Appinfo for a Catalog
+    def __init__(self, parsedAppInfo):
+        self.parsedAppInfo = parsedAppInfo
+
+
+def build_catalog(app_count, seed=0):
+    rng = random.Random(seed)
+    parsedAppInfo = {}
+    app_fields = {}
+
+    for app_id in range(10, (app_count + 2) * 10, 10):
+        name = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+        app_type = rng.choice(APP_TYPES)
+        launch = {
+            str(number): {
+                "executable": f"bin/game{number}.exe",
+                "description": f"Play {name} {number}",
+                "config": {"oslist": rng.choice(["windows", "linux", "macos"])},
+            }
+            for number in range(rng.randint(1, 5))
+        }
+        parsedAppInfo[app_id] = {
+            "sections": {
+                "appinfo": {
+                    "appid": app_id,
+                    "common": {
+                        "name": name,
+                        "type": app_type,
+                        "steam_release_date": rng.randint(1000000000, 1600000000),
+                    },
+                    "extended": {"developer": rng.choice(WORDS).title()},
+                    "config": {"installdir": name, "launch": launch},
+                }
+            }
+        }
+        app_fields[app_id] = {
+            "appinfo/common/name": name,
+            "appinfo/common/type": app_type,
+            "appinfo/config/installdir": name,
+        }
+
+    return Catalog(SyntheticAppinfo(parsedAppInfo), app_fields)
+
+
+def build_session(catalog, steps, seed=0):
+    """
+    Returns a list of (operation, arguments) steps, a mix of searches
+    typed one character at a time and edits on random apps.
+    """
+    rng = random.Random(seed)
+    app_ids = list(catalog.app_fields)
+    session = []
+
+    while len(session) < steps:
+        operation = rng.choice(OPERATIONS)
+        app_id = rng.choice(app_ids)
+        if operation == "search":
+            query = rng.choice(WORDS)
+            for length in range(1, len(query) + 1):
+                session.append(("search", (query[:length],)))
+            session.append(("search", ("",)))
+        elif operation in ("select", "add_launch", "rebuild"):
+            session.append((operation, (app_id,)))
+        elif operation in ("undo", "redo"):
+            session.append((operation, ()))
+        elif operation == "sort":
+            column = rng.choice(list(SORT_COLUMNS))
+            session.append(("sort", (column, rng.random() < 0.5)))
+        elif operation == "rename":
+            session.append(("rename", (app_id, f"Renamed {app_id}")))
+        elif operation == "developer":
+            session.append(("developer", (app_id, rng.choice(WORDS))))
+        elif operation == "timestamp":
+            date = (rng.randint(1990, 2020), rng.randint(1, 12), rng.randint(1, 28))
+            session.append(("timestamp", (app_id, *date)))
+        elif operation == "move_launch":
+            session.append(("move_launch", (app_id, "0", "down")))
+        elif operation == "delete_launch":
+            session.append(("delete_launch", (app_id, "0")))
+
+    return session[:steps]
+
+
+def run_step(catalog, operation, arguments):
+    if operation == "search":
+        catalog.search(arguments[0])
+    elif operation == "select":
+        catalog.get_app_details(*arguments)
+    elif operation == "rename":
+        app_id, name = arguments
+        catalog.set_data(app_id, name, "common", "name")
+        catalog.set_data(app_id, name, "common", "sortas")
+    elif operation == "developer":
+        catalog.set_developer(*arguments)
+    elif operation == "timestamp":
+        catalog.set_timestamp(arguments[0], "steam_release_date", *arguments[1:])
+    elif operation == "add_launch":
+        catalog.add_launch_option(*arguments)
+    elif operation == "move_launch":
+        if "0" in catalog.get_data(arguments[0], "config", "launch"):
+            catalog.move_launch_option(*arguments)
+    elif operation == "delete_launch":
+        if catalog.get_data(arguments[0], "config", "launch"):
+            catalog.delete_launch_option(*arguments)
+    elif operation == "rebuild":
+        catalog.build_app_list()
+    elif operation == "undo":
+        catalog.undo()
+    elif operation == "redo":
+        catalog.redo()
+    elif operation == "sort":
+        catalog.search("", *arguments)
+
+
+def replay(catalog, session):
+    # Maps every operation to the seconds each of its steps took
+    timings = {}
+    for operation, arguments in session:
+        start = perf_counter()
+        run_step(catalog, operation, arguments)
+        timings.setdefault(operation, []).append(perf_counter() - start)
+    return timings
+
+
+def format_timings(timings):
+    yield f"{'operation':<14}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"
+    for operation, seconds in sorted(timings.items()):
+        seconds = sorted(seconds)
+        count = len(seconds)
+        yield (
+            f"{operation:<14}{count:>8}"
+            f"{sum(seconds) / count * 1000:>10.3f}"
+            f"{seconds[count // 2] * 1000:>10.3f}"
+            f"{seconds[min(count * 95 // 100, count - 1)] * 1000:>10.3f}"
+            f"{seconds[-1] * 1000:>10.3f}"
+        )
+
+
+def main():
+    parser = ArgumentParser(description="benchmark the app catalog without a display")
+    parser.add_argument("--apps", type=int, default=50000, help="apps in the catalog")
+    parser.add_argument("--steps", type=int, default=2000, help="steps in the session")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = perf_counter()
+    catalog = build_catalog(args.apps, args.seed)
+    catalog.build_app_list()
+    print(f"Built a catalog of {args.apps} apps in {perf_counter() - start:.2f}s")
+
+    session = build_session(catalog, args.steps, args.seed)
+    for line in format_timings(replay(catalog, session)):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
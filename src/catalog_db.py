@@ -0,0 +1,155 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sqlite3
+from struct import unpack
+
+from appinfo import Appinfo
+from header_table import HEADER_FIELDS, HEADER_FORMAT
+
+
+SCHEMA_VERSION = 1
+
+# Number of apps written in a single transaction
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS apps (
+    appid INTEGER PRIMARY KEY,
+    size INTEGER NOT NULL,
+    state INTEGER NOT NULL,
+    last_update INTEGER NOT NULL,
+    access_token INTEGER NOT NULL,
+    checksum_text TEXT NOT NULL,
+    change_number INTEGER NOT NULL,
+    checksum_binary TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fields (
+    appid INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    value,
+    PRIMARY KEY (appid, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS fields_path ON fields (path, value);
+"""
+
+
+def open_database(path):
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version != SCHEMA_VERSION:
+        # Older layouts are rebuilt from scratch
+        connection.executescript(
+            "DROP INDEX IF EXISTS fields_path;"
+            "DROP TABLE IF EXISTS fields;"
+            "DROP TABLE IF EXISTS apps;"
+        )
+        connection.executescript(SCHEMA)
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return connection
+
+
+def read_headers(appinfo):
+    # Header of every app in file order, checksums in hex
+    headers = []
+    for data in appinfo.iter_raw_apps(header_only=True):
+        header = dict(zip(HEADER_FIELDS, unpack(HEADER_FORMAT, data)))
+        header["checksum_text"] = header["checksum_text"].hex()
+        header["checksum_binary"] = header["checksum_binary"].hex()
+        headers.append(header)
+    return headers
+
+
+def flatten(data, prefix=""):
+    # Yields the key path and value of every string and integer
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from flatten(value, f"{path}/")
+        else:
+            yield path, value
+
+
+def write_batch(connection, apps):
+    app_ids = [(header["appid"],) for header, sections in apps]
+    with connection:
+        connection.executemany("DELETE FROM fields WHERE appid = ?", app_ids)
+        connection.executemany(
+            f"INSERT OR REPLACE INTO apps ({', '.join(HEADER_FIELDS)}) "
+            + f"VALUES ({', '.join(':' + key for key in HEADER_FIELDS)})",
+            [header for header, sections in apps],
+        )
+        connection.executemany(
+            "INSERT INTO fields (appid, path, value) VALUES (?, ?, ?)",
+            (
+                (header["appid"], path, value)
+                for header, sections in apps
+                for path, value in flatten(sections)
+            ),
+        )
+
+
+def mirror_appinfo(vdf_path, database_path):
+    """
+    Mirrors appinfo.vdf into an SQLite database, with the header of
+    every app in the apps table and every string and integer value in
+    the fields table, keyed by its path (like "appinfo/common/name").
+
+    Only the apps whose change_number or checksum_binary differ from
+    the ones in the database are decoded, streamed from the file and
+    written in batches. Returns the number of apps in the file, and the
+    updated and removed appids.
+    """
+    appinfo = Appinfo(vdf_path, stream=True)
+    headers = read_headers(appinfo)
+    connection = open_database(database_path)
+
+    try:
+        stored = {
+            app_id: (change_number, checksum)
+            for app_id, change_number, checksum in connection.execute(
+                "SELECT appid, change_number, checksum_binary FROM apps"
+            )
+        }
+        changed = {
+            header["appid"]: header
+            for header in headers
+            if stored.get(header["appid"])
+            != (header["change_number"], header["checksum_binary"])
+        }
+        removed = set(stored).difference(header["appid"] for header in headers)
+
+        if removed:
+            with connection:
+                rows = [(app_id,) for app_id in removed]
+                connection.executemany("DELETE FROM fields WHERE appid = ?", rows)
+                connection.executemany("DELETE FROM apps WHERE appid = ?", rows)
+
+        batch = []
+        if changed:
+            for header, sections in appinfo.iter_apps(set(changed)):
+                batch.append((changed[header["appid"]], sections))
+                if len(batch) >= BATCH_SIZE:
+                    write_batch(connection, batch)
+                    batch = []
+        if batch:
+            write_batch(connection, batch)
+    finally:
+        connection.close()
+
+    return len(headers), list(changed), list(removed)
@@ -0,0 +1,241 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import sys
+from time import perf_counter
+
+from config import config
+from bulk_edit import BulkEditError, bulk_edit_appinfo, load_bulk_edit
+from catalog_db import mirror_appinfo
+from diff import diff_appinfo, format_diff
+from export import export_apps
+from field_index import FieldIndex
+from fleet import find_steam_roots, patch_roots
+from history import HistoryError, HistoryStore
+from query import QueryError, run_query
+from verify import format_report, verify_appinfo
+from watcher import ModificationWatcher
+
+
+def get_vdf_path():
+    return os.path.join(config.STEAM_PATH, "appcache", "appinfo.vdf")
+
+
+def get_selected_apps():
+    # None means every app in appinfo.vdf
+    if "all" in config.apps:
+        return None
+
+    apps = set()
+    for app in config.apps:
+        if app == "installed":
+            apps.update(config.read_library_folders())
+        else:
+            apps.add(app)
+    return apps
+
+
+def dump_apps():
+    start = perf_counter()
+    count = export_apps(
+        get_vdf_path(), config.dump, get_selected_apps(), config.jobs
+    )
+    print(
+        f"Exported {count} apps to {config.dump} "
+        + f"in {perf_counter() - start:.2f}s"
+    )
+
+
+def diff_files():
+    old_path = config.diff[0]
+    new_path = config.diff[1] if len(config.diff) == 2 else get_vdf_path()
+    report = diff_appinfo(old_path, new_path)
+    for line in format_diff(report):
+        print(line)
+    print(
+        f"{len(report['added'])} added, {len(report['removed'])} removed, "
+        + f"{len(report['changed'])} changed"
+    )
+
+
+def bulk_edit():
+    try:
+        edit = load_bulk_edit(config.bulk_edit)
+    except (OSError, BulkEditError) as error:
+        sys.exit(error)
+
+    start = perf_counter()
+    edited, scanned = bulk_edit_appinfo(
+        get_vdf_path(),
+        edit,
+        f"{config.CONFIG_PATH}/modifications.json",
+        f"{config.CONFIG_PATH}/originals.bin",
+        config.jobs,
+    )
+    elapsed = perf_counter() - start
+    print(
+        f"Edited {len(edited)} of {scanned} apps in {elapsed:.2f}s "
+        + f"({scanned / max(elapsed, 1e-9):.0f} apps/s)"
+    )
+
+
+def query_apps():
+    start = perf_counter()
+    index = FieldIndex(f"{config.CONFIG_PATH}/field_index.json", get_vdf_path())
+    try:
+        apps = run_query(index, config.query)
+    except QueryError as error:
+        sys.exit(error)
+
+    names = index.get_column("common/name")
+    rows = {app_id: row for row, app_id in enumerate(index.appids)}
+    for app_id in apps:
+        print(f"{app_id}\t{names[rows[app_id]] or ''}")
+    print(f"{len(apps)} apps found in {perf_counter() - start:.3f}s")
+
+
+def mirror_to_sqlite():
+    start = perf_counter()
+    count, updated, removed = mirror_appinfo(get_vdf_path(), config.sqlite)
+    print(
+        f"Mirrored {count} apps to {config.sqlite} in {perf_counter() - start:.2f}s "
+        + f"({len(updated)} updated, {len(removed)} removed)"
+    )
+
+
+def get_history():
+    return HistoryStore(f"{config.CONFIG_PATH}/history")
+
+
+def take_snapshot():
+    start = perf_counter()
+    try:
+        name, new_count = get_history().snapshot(get_vdf_path())
+    except HistoryError as error:
+        sys.exit(error)
+    elapsed = perf_counter() - start
+    if name is None:
+        print(f"Nothing changed since the last snapshot ({elapsed:.2f}s)")
+    else:
+        print(f"Stored snapshot {name} with {new_count} new objects in {elapsed:.2f}s")
+
+
+def list_snapshots():
+    for name in get_history().get_snapshots():
+        print(name[:-len(".manifest")])
+
+
+def restore_snapshot():
+    name, output_path = config.restore
+    try:
+        get_history().restore(name, output_path)
+    except HistoryError as error:
+        sys.exit(error)
+    print(f"Restored snapshot {name} to {output_path}")
+
+
+def verify_files():
+    for vdf_path in config.verify or [get_vdf_path()]:
+        start = perf_counter()
+        report = verify_appinfo(vdf_path, config.jobs)
+        elapsed = perf_counter() - start
+        for line in format_report(report):
+            print(line)
+        status = "is corrupt" if report["corrupt"] or report["errors"] else "is intact"
+        print(
+            f"{vdf_path} {status}, {report['apps']} apps checked in {elapsed:.2f}s "
+            + f"({report['size'] / max(elapsed, 1e-9) / 1024 ** 2:.0f} MB/s)"
+        )
+
+
+def patch_steam_roots():
+    start = perf_counter()
+    roots = find_steam_roots(config.roots)
+    if not roots:
+        print("No Steam installs found")
+        return
+
+    failed = 0
+    for result in patch_roots(
+        roots, f"{config.CONFIG_PATH}/modifications.json", config.jobs_option
+    ):
+        if result["error"] is not None:
+            failed += 1
+            status = f"failed: {result['error']}"
+        else:
+            status = f"patched {len(result['patched'])} apps"
+        print(f"{result['root']}\t{status} in {result['elapsed']:.2f}s", flush=True)
+    print(
+        f"{len(roots) - failed} of {len(roots)} Steam installs patched "
+        + f"in {perf_counter() - start:.2f}s"
+    )
+    if failed:
+        sys.exit(1)
+
+
+def watch_appinfo():
+    watcher = ModificationWatcher(
+        get_vdf_path(),
+        f"{config.CONFIG_PATH}/modifications.json",
+        config.jobs,
+    )
+    try:
+        watcher.run(log=lambda message: print(message, flush=True))
+    except KeyboardInterrupt:
+        pass
+
+
+def run_command():
+    """
+    Runs the command given in the command line, if any.
+    Returns False when the GUI should be started instead.
+    """
+    if config.dump is not None:
+        dump_apps()
+        return True
+    if config.diff is not None:
+        diff_files()
+        return True
+    if config.query is not None:
+        query_apps()
+        return True
+    if config.bulk_edit is not None:
+        bulk_edit()
+        return True
+    if config.sqlite is not None:
+        mirror_to_sqlite()
+        return True
+    if config.snapshot:
+        take_snapshot()
+        return True
+    if config.snapshots:
+        list_snapshots()
+        return True
+    if config.restore is not None:
+        restore_snapshot()
+        return True
+    if config.verify is not None:
+        verify_files()
+        return True
+    if config.roots is not None:
+        patch_steam_roots()
+        return True
+    if config.watch:
+        watch_appinfo()
+        return True
+
+    return False
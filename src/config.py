@@ -14,13 +14,19 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-import re
 import os
 import platform
 from argparse import ArgumentParser
 from configparser import ConfigParser, ParsingError
 
 from utils import ask_steam_path
+from vdf_text import load, get_app_libraries
+
+
+def app_selection(value):
+    if value in ("all", "installed"):
+        return value
+    return int(value)
 
 
 class Config:
@@ -36,14 +42,9 @@ class Config:
         except ParsingError:
             self.create_new_config_file()
 
-        self.STEAM_PATH = self.get_steam_path()
+        self.steam_path = None
 
     def set_default_variables(self):
-        # Looks for "path"		"/some/path"
-        self.PATH_REGEX = re.compile('"path"\t\t"(.*)"')
-        # Looks for "0213123"		"1395050123"
-        self.APP_REGEX = re.compile('"([0-9]+)"\t\t"[0-9]+"')
-
         self.BG = "#23272c"
         self.FG = "#b8b6b4"
 
@@ -91,6 +92,13 @@ class Config:
             action="store_true",
             help="silently patch appinfo.vdf with previously made modifications",
         )
+        parser.add_argument(
+            "-w",
+            "--watch",
+            action="store_true",
+            help="keep running and patch back modifications whenever Steam "
+            + "overwrites them",
+        )
         parser.add_argument(
             "-e",
             "--export",
@@ -98,9 +106,106 @@ class Config:
             type=int,
             help="export the contents of all the given appIDs into the JSON",
         )
+        parser.add_argument(
+            "-d",
+            "--dump",
+            metavar="FILE",
+            help="stream apps into FILE as JSON Lines (.jsonl) or JSON (.json), "
+            + "optionally compressed (.gz, .bz2, .xz)",
+        )
+        parser.add_argument(
+            "--apps",
+            nargs="+",
+            default=["all"],
+            type=app_selection,
+            help="apps used by --dump: all, installed or a list of appIDs",
+        )
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            help="number of workers used to encode and hash apps, "
+            + "defaults to the number of CPUs (at most 4 for --roots)",
+        )
+        parser.add_argument(
+            "--diff",
+            nargs="+",
+            metavar="VDF",
+            help="list the apps that changed between two appinfo.vdf files, "
+            + "the second one defaults to the current one",
+        )
+        parser.add_argument(
+            "-b",
+            "--bulk-edit",
+            metavar="FILE",
+            help="apply the rules or the CSV/JSON mapping in FILE to every app "
+            + "and save the changes as modifications",
+        )
+        parser.add_argument(
+            "-q",
+            "--query",
+            metavar="EXPR",
+            help="list the apps matching EXPR, e.g. "
+            + "'type == DLC and original_release_date < 2010-01-01'",
+        )
+        parser.add_argument(
+            "--sqlite",
+            metavar="FILE",
+            help="mirror the headers and fields of every app into an SQLite "
+            + "database, only the apps that changed are written again",
+        )
+        parser.add_argument(
+            "--snapshot",
+            action="store_true",
+            help="store the current appinfo.vdf in the history, only the apps "
+            + "that weren't seen before take up space",
+        )
+        parser.add_argument(
+            "--snapshots",
+            action="store_true",
+            help="list the snapshots in the history",
+        )
+        parser.add_argument(
+            "--restore",
+            nargs=2,
+            metavar=("SNAPSHOT", "FILE"),
+            help="write the appinfo.vdf of a snapshot to FILE",
+        )
+        parser.add_argument(
+            "--verify",
+            nargs="*",
+            metavar="VDF",
+            help="check the app sizes, checksums and string table of "
+            + "appinfo.vdf files, defaults to the current one",
+        )
+        parser.add_argument(
+            "--roots",
+            nargs="+",
+            metavar="PATH",
+            help="apply the modifications to the Steam installs at, or "
+            + "anywhere under, every PATH",
+        )
         args = parser.parse_args()
+        if args.diff is not None and len(args.diff) > 2:
+            parser.error("argument --diff: expected at most two files")
         self.silent = args.silent
+        self.watch = args.watch
         self.export = args.export
+        self.dump = args.dump
+        self.apps = args.apps
+        self.jobs = max(args.jobs or os.cpu_count() or 1, 1)
+        # None when --jobs isn't given, so commands can pick their own
+        # default
+        self.jobs_option = args.jobs and max(args.jobs, 1)
+        self.diff = args.diff
+        self.bulk_edit = args.bulk_edit
+        self.query = args.query
+        self.sqlite = args.sqlite
+        self.snapshot = args.snapshot
+        self.snapshots = args.snapshots
+        self.restore = args.restore
+        self.verify = args.verify
+        self.roots = args.roots
 
     def ensure_config_file_exists(self):
         if not os.path.isfile(f"{self.CONFIG_PATH}/config.cfg"):
@@ -117,6 +222,14 @@ class Config:
         with open(f"{self.CONFIG_PATH}/config.cfg", "w") as cfg:
             self.config_parser.write(cfg)
 
+    @property
+    def STEAM_PATH(self):
+        # Looked up on first use, so commands working on the given
+        # files never ask for Steam's location
+        if self.steam_path is None:
+            self.steam_path = self.get_steam_path()
+        return self.steam_path
+
     def get_steam_path(self):
         if "STEAMPATH" in self.config_parser:
             steam_path = self.config_parser.get("STEAMPATH", "Path")
@@ -133,6 +246,13 @@ class Config:
 
         return steam_path
 
+    def get_library_folders_path(self):
+        return os.path.join(self.STEAM_PATH, "steamapps", "libraryfolders.vdf")
+
+    def read_library_folders(self):
+        # Maps every installed appid to the library it's installed in
+        return get_app_libraries(load(self.get_library_folders_path()))
+
     def verify_steam_path(self, steam_path):
         if not steam_path:
             return False
@@ -0,0 +1,114 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from appinfo import Appinfo
+from header_table import HeaderTable
+
+
+NAME_PATH = "appinfo/common/name"
+
+
+def flatten_sections(data, prefix=""):
+    for key, value in data.items():
+        path = f"{prefix}/{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from flatten_sections(value, path)
+        else:
+            yield path, value
+
+
+def diff_sections(old, new, prefix=""):
+    """
+    Yields a (path, old value, new value) tuple for every leaf that
+    differs between both trees. Missing values are None.
+    """
+    for key in old.keys() | new.keys():
+        path = f"{prefix}/{key}" if prefix else key
+        old_value = old.get(key)
+        new_value = new.get(key)
+        if old_value == new_value:
+            continue
+
+        if isinstance(old_value, dict) and isinstance(new_value, dict):
+            yield from diff_sections(old_value, new_value, path)
+            continue
+
+        if isinstance(old_value, dict):
+            for leaf_path, value in flatten_sections(old_value, path):
+                yield leaf_path, value, None
+            old_value = None
+        if isinstance(new_value, dict):
+            for leaf_path, value in flatten_sections(new_value, path):
+                yield leaf_path, None, value
+            new_value = None
+        if old_value is not None or new_value is not None:
+            yield path, old_value, new_value
+
+
+def diff_appinfo(old_path, new_path):
+    """
+    Compares two appinfo.vdf files. Apps are matched by appid using only
+    their headers, and only the apps whose checksum_binary or
+    change_number differ get decoded and compared key by key.
+
+    Returns a dictionary with the added and removed apps (appid to name)
+    and the changed ones (appid to name and a sorted list of
+    (path, old value, new value) changes).
+    """
+    old_appinfo = Appinfo(old_path, stream=True)
+    new_appinfo = Appinfo(new_path, stream=True)
+
+    added, removed, changed = HeaderTable(new_appinfo).diff(
+        HeaderTable(old_appinfo)
+    )
+
+    report = {
+        "added": {
+            app_id: fields.get(NAME_PATH, "")
+            for app_id, fields in new_appinfo.iter_fields([NAME_PATH], added)
+        },
+        "removed": {
+            app_id: fields.get(NAME_PATH, "")
+            for app_id, fields in old_appinfo.iter_fields([NAME_PATH], removed)
+        },
+        "changed": {},
+    }
+
+    old_sections = {
+        header["appid"]: sections
+        for header, sections in old_appinfo.iter_apps(changed)
+    }
+    for header, sections in new_appinfo.iter_apps(changed):
+        app_id = header["appid"]
+        name = sections.get("appinfo", {}).get("common", {}).get("name", "")
+        changes = sorted(
+            diff_sections(old_sections.pop(app_id), sections),
+            key=lambda change: change[0],
+        )
+        report["changed"][app_id] = (name, changes)
+
+    return report
+
+
+def format_diff(report):
+    for app_id, name in report["added"].items():
+        yield f"+ {app_id} {name}"
+    for app_id, name in report["removed"].items():
+        yield f"- {app_id} {name}"
+    for app_id, (name, changes) in report["changed"].items():
+        yield f"~ {app_id} {name}"
+        for path, old_value, new_value in changes:
+            yield f"    {path}: {old_value!r} -> {new_value!r}"
@@ -0,0 +1,152 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from collections import deque
+from contextlib import contextmanager
+from time import monotonic
+
+
+# Steps kept before the oldest ones are forgotten
+UNDO_LIMIT = 1000
+# Seconds between changes to the same keys that still count as one
+# step, so typing a name is undone at once
+MERGE_DELAY = 1.0
+
+# Value of keys that didn't exist
+MISSING = object()
+
+
+class EditStep:
+    """
+    Changes made to an app by a single edit. Changes are ("set", path,
+    old, new) for a key set or removed (MISSING), and ("items", path,
+    old, new) for a section whose items were replaced, with the items as
+    lists of (key, value). Values are the objects in the tree, not
+    copies, so a step only holds the keys along the changed path and
+    shares everything below them with the app.
+    """
+
+    __slots__ = ("app_id", "changes", "time")
+
+    def __init__(self, app_id):
+        self.app_id = app_id
+        self.changes = []
+        self.time = monotonic()
+
+    def can_merge(self, app_id, change):
+        return (
+            self.app_id == app_id
+            and change[0] == "set"
+            and all(kind == "set" for kind, path, old, new in self.changes)
+            and monotonic() - self.time < MERGE_DELAY
+        )
+
+    def add(self, change):
+        # A key set again keeps the value it had before the step
+        kind, path, old, new = change
+        for index, (other_kind, other_path, other_old, other_new) in enumerate(self.changes):
+            if other_kind == "set" and other_path == path:
+                self.changes[index] = (kind, path, other_old, new)
+                break
+        else:
+            self.changes.append(change)
+        self.time = monotonic()
+
+
+class EditHistory:
+    """
+    Undo and redo stacks of the edits made to apps. Edits go through
+    record as they happen, and changes recorded inside group() end up in
+    the same step. undo and redo apply the steps with apply_change,
+    which is given the appid, kind, path and value of every change.
+    """
+
+    def __init__(self, apply_change, limit=UNDO_LIMIT):
+        self.apply_change = apply_change
+        self.undo_steps = deque(maxlen=limit)
+        self.redo_steps = []
+        # Step changes are added to while a group is open
+        self.current = None
+        self.group_depth = 0
+        # Set after undo and redo, so the next edit starts a new step
+        self.closed = False
+
+    @contextmanager
+    def group(self):
+        self.group_depth += 1
+        try:
+            yield
+        finally:
+            self.group_depth -= 1
+            if not self.group_depth:
+                self.current = None
+
+    def record(self, app_id, change):
+        self.redo_steps.clear()
+        step = self.current
+        if step is None or step.app_id != app_id:
+            last = self.undo_steps[-1] if self.undo_steps else None
+            if last is not None and not self.closed and last.can_merge(app_id, change):
+                step = last
+            else:
+                step = EditStep(app_id)
+                self.undo_steps.append(step)
+            self.closed = False
+            if self.group_depth:
+                self.current = step
+        step.add(change)
+
+    def can_undo(self):
+        return bool(self.undo_steps)
+
+    def can_redo(self):
+        return bool(self.redo_steps)
+
+    def undo(self):
+        # Returns the appid of the undone step, or None
+        if not self.undo_steps:
+            return None
+        step = self.undo_steps.pop()
+        for kind, path, old, new in reversed(step.changes):
+            self.apply_change(step.app_id, kind, path, old)
+        self.redo_steps.append(step)
+        self.closed = True
+        return step.app_id
+
+    def redo(self):
+        if not self.redo_steps:
+            return None
+        step = self.redo_steps.pop()
+        for kind, path, old, new in step.changes:
+            self.apply_change(step.app_id, kind, path, new)
+        self.undo_steps.append(step)
+        self.closed = True
+        return step.app_id
+
+    def forget(self, app_id):
+        # Drops the steps of an app whose data was replaced, like when
+        # it's reverted
+        self.undo_steps = deque(
+            (step for step in self.undo_steps if step.app_id != app_id),
+            maxlen=self.undo_steps.maxlen,
+        )
+        self.redo_steps = [step for step in self.redo_steps if step.app_id != app_id]
+        self.current = None
+
+    def clear(self):
+        self.undo_steps.clear()
+        self.redo_steps.clear()
+        self.current = None
@@ -0,0 +1,126 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import bz2
+import gzip
+import json
+import lzma
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from appinfo import Appinfo
+
+
+COMPRESSORS = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open,
+}
+
+# Number of apps sent to a worker at once
+BATCH_SIZE = 256
+
+
+def open_output(path):
+    for suffix, opener in COMPRESSORS.items():
+        if path.endswith(suffix):
+            return opener(path, "wb"), path[:-len(suffix)]
+    return open(path, "wb"), path
+
+
+def encode_app(header, sections, json_lines):
+    if json_lines:
+        app = dict(header)
+        app["checksum_text"] = app["checksum_text"].hex()
+        app["checksum_binary"] = app["checksum_binary"].hex()
+        app["sections"] = sections
+        return json.dumps(
+            app, ensure_ascii=False, separators=(",", ":")
+        ).encode() + b"\n"
+
+    # The sections of the app keyed by its appid, without the
+    # "modified" and "original" wrapper of modifications.json
+    return (
+        f'"{header["appid"]}":'.encode()
+        + json.dumps(sections, ensure_ascii=False, separators=(",", ":")).encode()
+    )
+
+
+# Appinfo of each worker process, read once by its first batch
+worker_appinfo = None
+
+
+def encode_raw_apps(vdf_path, raw_apps, json_lines):
+    global worker_appinfo
+    if worker_appinfo is None:
+        worker_appinfo = Appinfo(vdf_path, stream=True)
+    return [
+        encode_app(*worker_appinfo.parse_app_data(data), json_lines)
+        for data in raw_apps
+    ]
+
+
+def iter_encoded_apps(appinfo, apps, json_lines, jobs):
+    if jobs == 1:
+        for header, sections in appinfo.iter_apps(apps):
+            yield encode_app(header, sections, json_lines)
+        return
+
+    # Reading stays in this process and decoding and encoding are
+    # spread across the workers. Only a few batches are in flight at
+    # any time so memory stays bounded.
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        batch = []
+        for data in appinfo.iter_raw_apps(apps):
+            batch.append(data)
+            if len(batch) < BATCH_SIZE:
+                continue
+            pending.append(executor.submit(encode_raw_apps, appinfo.vdf_path, batch, json_lines))
+            batch = []
+            if len(pending) >= jobs * 2:
+                yield from pending.popleft().result()
+
+        if batch:
+            pending.append(executor.submit(encode_raw_apps, appinfo.vdf_path, batch, json_lines))
+        while pending:
+            yield from pending.popleft().result()
+
+
+def export_apps(vdf_path, output_path, apps=None, jobs=1):
+    """
+    Streams the given apps (all of them if apps is None) from appinfo.vdf
+    into output_path. The format is picked from the file extension,
+    .json writes a single object keyed by appid, anything else writes
+    one JSON object per line. Returns the number of exported apps.
+    """
+    appinfo = Appinfo(vdf_path, stream=True)
+    output, path = open_output(output_path)
+    json_lines = not path.endswith(".json")
+
+    count = 0
+    with output:
+        if not json_lines:
+            output.write(b"{")
+        for encoded_app in iter_encoded_apps(appinfo, apps, json_lines, jobs):
+            if not json_lines and count:
+                output.write(b",")
+            output.write(encoded_app)
+            count += 1
+        if not json_lines:
+            output.write(b"}")
+
+    return count
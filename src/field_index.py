@@ -0,0 +1,160 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import json
+from json import JSONDecodeError
+
+from appinfo import Appinfo
+from header_table import HeaderTable
+
+
+INDEX_VERSION = 1
+
+# Key paths (inside the appinfo section) indexed from the start, any
+# other path gets its column the first time it's needed
+INDEX_FIELDS = [
+    "common/name",
+    "common/type",
+    "common/sortas",
+    "extended/developer",
+    "extended/publisher",
+    "common/steam_release_date",
+    "common/original_release_date",
+    "common/oslist",
+]
+
+
+class FieldIndex:
+    """
+    Columns of values for some key paths of every app in appinfo.vdf,
+    kept in a JSON file so queries don't have to read appinfo.vdf.
+
+    Every column is a list in the same order as appids, with None for
+    apps that don't have the path. When appinfo.vdf changes, only the
+    apps whose checksum_binary changed are read again.
+    """
+
+    def __init__(self, path, vdf_path):
+        self.path = path
+        self.vdf_path = vdf_path
+        self.appids = []
+        # checksum_binary of every app, in hex
+        self.checksums = []
+        self.columns = {}
+        self.stat = None
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as index:
+                data = json.load(index)
+        except (FileNotFoundError, JSONDecodeError):
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+        self.stat = data["stat"]
+        self.appids = data["appids"]
+        self.checksums = data["checksums"]
+        self.columns = data["columns"]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as index:
+            json.dump(
+                {
+                    "version": INDEX_VERSION,
+                    "stat": self.stat,
+                    "appids": self.appids,
+                    "checksums": self.checksums,
+                    "columns": self.columns,
+                },
+                index,
+            )
+        os.replace(temp_path, self.path)
+
+    def get_vdf_stat(self):
+        stat = os.stat(self.vdf_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def read_fields(self, appinfo, paths, apps=None):
+        # Maps every app to the values of the given paths
+        full_paths = [f"appinfo/{path}" for path in paths]
+        return {
+            app_id: [fields.get(path) for path in full_paths]
+            for app_id, fields in appinfo.iter_fields(full_paths, apps)
+        }
+
+    def refresh(self, paths=()):
+        """
+        Brings the index up to date with appinfo.vdf and makes sure it
+        has a column for every given path. Returns True if it changed.
+        """
+        stat = self.get_vdf_stat()
+        missing = [path for path in dict.fromkeys(paths) if path not in self.columns]
+        if not self.columns:
+            missing = list(dict.fromkeys(INDEX_FIELDS + missing))
+        if stat == self.stat and not missing:
+            return False
+
+        appinfo = Appinfo(self.vdf_path, stream=True)
+
+        if stat != self.stat:
+            table = HeaderTable(appinfo)
+            versions = table.get_versions()
+            rows = {app_id: row for row, app_id in enumerate(self.appids)}
+            appids = table.get_appids()
+            checksums = [versions[app_id][0].hex() for app_id in appids]
+            changed = [
+                app_id
+                for app_id, checksum in zip(appids, checksums)
+                if app_id not in rows or self.checksums[rows[app_id]] != checksum
+            ]
+
+            indexed_paths = list(self.columns)
+            columns = {path: [] for path in indexed_paths}
+            if indexed_paths:
+                fields = self.read_fields(appinfo, indexed_paths, set(changed))
+                for app_id in appids:
+                    if app_id in fields:
+                        values = fields[app_id]
+                    else:
+                        row = rows[app_id]
+                        values = [self.columns[path][row] for path in indexed_paths]
+                    for path, value in zip(indexed_paths, values):
+                        columns[path].append(value)
+
+            self.appids = appids
+            self.checksums = checksums
+            self.columns = columns
+            self.stat = stat
+
+        if missing:
+            fields = self.read_fields(appinfo, missing)
+            for index, path in enumerate(missing):
+                self.columns[path] = [
+                    fields.get(app_id, [None] * len(missing))[index]
+                    for app_id in self.appids
+                ]
+
+        self.save()
+        return True
+
+    def get_column(self, path):
+        if path == "appid":
+            return self.appids
+        return self.columns[path]
@@ -0,0 +1,90 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+
+from watcher import ModificationWatcher
+
+
+# How deep Steam installs are looked for under a directory
+MAX_DEPTH = 6
+
+# Every worker loads a whole appinfo.vdf, so unless told otherwise only
+# a few installs are patched at once to keep memory in check
+DEFAULT_JOBS = 4
+
+
+def get_vdf_path(root):
+    return os.path.join(root, "appcache", "appinfo.vdf")
+
+
+def find_steam_roots(paths, max_depth=MAX_DEPTH):
+    """
+    Returns every Steam install given, or found under the given
+    directories, once. Directories below an install aren't searched.
+    """
+    roots = {}
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isfile(get_vdf_path(path)):
+            roots[os.path.realpath(path)] = path
+            continue
+
+        base_depth = path.rstrip(os.sep).count(os.sep)
+        for directory, subdirectories, files in os.walk(path):
+            if os.path.isfile(get_vdf_path(directory)):
+                roots.setdefault(os.path.realpath(directory), directory)
+                subdirectories.clear()
+            elif directory.count(os.sep) - base_depth >= max_depth:
+                subdirectories.clear()
+            else:
+                subdirectories.sort()
+    return list(roots.values())
+
+
+def patch_root(root, modifications_path):
+    # Runs in a worker process, errors are returned instead of raised
+    # so one broken install doesn't stop the others
+    start = perf_counter()
+    result = {"root": root, "patched": [], "error": None}
+    try:
+        watcher = ModificationWatcher(get_vdf_path(root), modifications_path, jobs=1)
+        result["patched"] = watcher.reapply()
+    except Exception as error:
+        result["error"] = f"{type(error).__name__}: {error}"
+    result["elapsed"] = perf_counter() - start
+    return result
+
+
+def patch_roots(roots, modifications_path, jobs=None):
+    """
+    Applies the modifications to every Steam install in a pool of
+    processes, each one patching only the apps that don't hold their
+    modified data yet. Yields the result of every install as soon as
+    it's done. Without jobs, at most DEFAULT_JOBS installs are patched
+    at once.
+    """
+    if not roots:
+        return
+    jobs = jobs or min(os.cpu_count() or 1, DEFAULT_JOBS)
+    with ProcessPoolExecutor(max_workers=min(jobs, len(roots))) as executor:
+        futures = [
+            executor.submit(patch_root, root, modifications_path) for root in roots
+        ]
+        for future in as_completed(futures):
+            yield future.result()
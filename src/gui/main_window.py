@@ -17,7 +17,6 @@
 import os
 import json
 from copy import deepcopy
-from datetime import datetime
 from json import JSONDecodeError
 
 import tkinter as tk
@@ -25,7 +24,11 @@ from tkinter import filedialog, messagebox
 from tkinter.ttk import Treeview, Style
 
 from config import config
-from appinfo import Appinfo
+from appinfo import Appinfo, CorruptedDataError
+from backups import OriginalStore
+from catalog import Catalog
+from background_save import BackgroundSave
+from install_cache import InstallCache
 
 from gui.widgets import (
     Frame,
@@ -40,9 +43,37 @@ from gui.widgets import (
 )
 
 
+# Milliseconds between checks on a save in progress
+SAVE_POLL_INTERVAL = 100
+
+# Fields shown in the app list, read without decoding whole apps
+LIST_FIELDS = [
+    "appinfo/common/name",
+    "appinfo/common/type",
+    "appinfo/config/installdir",
+]
+
+# Heading, text and catalog column of every column of the app list
+APP_LIST_HEADINGS = [
+    ("#0", "App Name", "name"),
+    ("Type", "Type", "type"),
+    ("Mod", "Modified", "modified"),
+    ("ID", "ID", "appid"),
+]
+
+
 class MainWindow:
     def __init__(self):
         self.modifiedApps = []
+        self.installPaths = {}
+        self.saveWorker = None
+        self.launchMenuWindow = None
+        # Column of the catalog the app list is sorted by
+        self.sortColumn = "name"
+        self.sortReverse = False
+        # Actions that have to wait for the save in progress
+        self.saveQueue = []
+        self.originals = OriginalStore(f"{config.CONFIG_PATH}/originals.bin")
         silent = config.silent
         export = config.export
         self.vdf_path = os.path.join(
@@ -56,8 +87,10 @@ class MainWindow:
                 self.vdf_path, True, apps=self.modifiedApps
             )
 
-            for app in self.modifiedApps:
-                self.save_original_data(app)
+            # Apps that were already modified keep their original data
+            for app in export:
+                if str(app) not in self.jsonData:
+                    self.save_original_data(app)
 
             self.write_modifications()
 
@@ -93,8 +126,12 @@ class MainWindow:
         self.window.withdraw()
         loadingWindow = LoadingWindow(self.window)
 
-        # Load appinfo
-        self.appinfo = Appinfo(self.vdf_path)
+        # Load appinfo, apps are decoded once they are needed
+        self.appinfo = Appinfo(self.vdf_path, lazy=True)
+        self.appFields = dict(self.appinfo.iter_fields(LIST_FIELDS))
+        self.catalog = Catalog(
+            self.appinfo, self.appFields, self.modifiedApps, self.save_original_data
+        )
 
         # Button images
         self.upArrowImage = tk.PhotoImage(file=f"{config.IMG_PATH}/UpArrow.png")
@@ -162,15 +199,20 @@ class MainWindow:
         self.appListScrollbar = Scrollbar(self.leftFrame)
 
         self.appList = Treeview(self.leftFrame, columns=("Type", "Mod", "ID"))
-        self.appList.heading("#0", text="App Name")
-        self.appList.heading("Type", text="Type")
-        self.appList.heading("Mod", text="Modified")
-        self.appList.heading("ID", text="ID")
+        for heading, text, column in APP_LIST_HEADINGS:
+            self.appList.heading(
+                heading,
+                text=text,
+                command=lambda column=column: self.sort_app_list(column),
+            )
         self.appList.column("#0", width=300, stretch=False)
         self.appList.column("Type", width=50, minwidth=20)
         self.appList.column("Mod", width=55, minwidth=20)
         self.appList.column("ID", width=80, minwidth=80)
         self.appList.bind("<<TreeviewSelect>>", self.fetch_app_data)
+        self.window.bind_all("<Control-z>", lambda _event: self.undo_edit())
+        self.window.bind_all("<Control-y>", lambda _event: self.redo_edit())
+        self.window.bind_all("<Control-Z>", lambda _event: self.redo_edit())
 
         # Widgets (right side)
         self.idLabel = Label(self.rightIdFrame, text="ID:")
@@ -265,11 +307,17 @@ class MainWindow:
             text="Revert App",
             command=lambda: self.revert_app(self.idVar.get()),
         )
+        self.revertAllButton = Button(
+            self.buttonsFrame,
+            text="Revert All",
+            command=self.revert_all_apps,
+        )
         self.saveButton = Button(
             self.buttonsFrame,
             text="Save",
-            command=self.write_data_to_appinfo,
+            command=self.save_in_background,
         )
+        self.saveStatusLabel = Label(self.buttonsFrame, text="")
 
         # Pack widgets (left side)
         self.searchBar.pack(side="top", fill="both", pady=(0, 10))
@@ -300,7 +348,9 @@ class MainWindow:
 
         self.launchMenuButton.pack(side="left")
         self.revertAppButton.pack(side="left")
+        self.revertAllButton.pack(side="left")
         self.saveButton.pack(side="right")
+        self.saveStatusLabel.pack(side="right", padx=10)
 
         # Frames
         self.leftFrame.pack(side="left", fill="both")
@@ -344,39 +394,29 @@ class MainWindow:
         self.center_window(self.window)
 
     def mark_installed_games(self):
-        lbryPath = os.path.join(config.STEAM_PATH, "steamapps", "libraryfolders.vdf")
-        with open(lbryPath, "r") as libraries:
-            contents = libraries.read()
-            libraries = config.PATH_REGEX.findall(contents)
-            apps = [int(x) for x in config.APP_REGEX.findall(contents)]
-
-        for library in libraries:
-            for app in apps:
-                install_dir = self.get_data_from_section(
-                    app, "config", "installdir"
-                )
-                install_path = os.path.join(
-                    library, "steamapps", "common", install_dir
-                )
-                if not os.path.exists(install_path):
-                    continue
-                self.appinfo.parsedAppInfo[app]["installed"] = True
-                self.appinfo.parsedAppInfo[app][
-                    "install_path"
-                ] = install_path
+        install_cache = InstallCache(
+            f"{config.CONFIG_PATH}/installs.json", config.get_library_folders_path()
+        )
+        self.installPaths = install_cache.get_install_paths(
+            lambda app: self.appFields.get(app, {}).get("appinfo/config/installdir", "")
+        )
+
+    def update_json_data(self):
+        for app in self.modifiedApps:
+            self.jsonData[str(app)]["modified"] = self.appinfo.parsedAppInfo[app][
+                "sections"
+            ]
 
     def write_modifications(self):
         with open(f"{config.CONFIG_PATH}/modifications.json", "w") as mod:
-            for app in self.modifiedApps:
-                self.jsonData[str(app)][
-                    "modified"
-                ] = self.appinfo.parsedAppInfo[app]["sections"]
+            self.update_json_data()
             json.dump(self.jsonData, mod, indent=2)
 
     def save_original_data(self, appID):
-        appData = deepcopy(self.appinfo.parsedAppInfo[appID]["sections"])
+        # The original bytes are kept apart, so reverting doesn't need
+        # to encode the app again
+        self.originals.save(self.appinfo, appID)
         self.jsonData[str(appID)] = {}
-        self.jsonData[str(appID)]["original"] = appData
 
     def load_modifications(self):
         try:
@@ -390,17 +430,8 @@ class MainWindow:
             self.jsonData = {}
 
     def get_data_from_section(self, appID, *sections, error=""):
-        data = self.appinfo.parsedAppInfo[appID]["sections"]["appinfo"]
-        for section in sections:
-            try:
-                data = data[section]
-            except KeyError:
-                return error
-
-        return data
+        return self.catalog.get_data(appID, *sections, error=error)
 
-    # Given a var, it removes the callback, sets the value
-    # and reassigns the callback
     def set_var_no_callback(self, var, value, callback):
         try:
             callbackId = var.trace_vinfo()[0][1]
@@ -412,79 +443,36 @@ class MainWindow:
         var.trace_add("write", callback)
 
     def set_data_from_section(self, appID, value, *sections):
-        appID = int(appID)
-
-        if appID not in self.modifiedApps:
-            self.save_original_data(appID)
-            self.modifiedApps.append(appID)
-
-        data = self.appinfo.parsedAppInfo[appID]["sections"]["appinfo"]
-        # Access all but the last element
-        for section in sections[0:len(sections) - 1]:
-            try:
-                data = data[section]
-            except KeyError:
-                data[section] = {}
-                data = data[section]
-
-        data[sections[-1]] = value
-
-    def get_unix_time(self, year, month, day):
-        return int(datetime(year, month, day).timestamp())
+        self.catalog.set_data(appID, value, *sections)
 
     def set_timestamps(self, stampId):
         appID = int(self.idVar.get())
 
-        def validate_date_format(year, month, day):
-            if len(str(year)) > 4 or year < 1970:
-                return False
-            try:
-                if datetime(year, month, day) > datetime.today():
-                    return False
-            except ValueError:
-                return False
-
-            return True
-
         if stampId == "original":
-
-            try:
-                year = int(self.ogRelease1Var.get())
-                month = int(self.ogRelease2Var.get())
-                day = int(self.ogRelease3Var.get())
-            # This happens when the field is empty
-            except ValueError:
-                return
-
-            if validate_date_format(year, month, day):
-
-                appOgReleaseDate = self.get_unix_time(year, month, day)
-                self.set_data_from_section(
-                    appID, appOgReleaseDate, "common", "original_release_date"
-                )
+            key = "original_release_date"
+            dateVars = (self.ogRelease1Var, self.ogRelease2Var, self.ogRelease3Var)
         elif stampId == "steam":
+            key = "steam_release_date"
+            dateVars = (
+                self.steamRelease1Var,
+                self.steamRelease2Var,
+                self.steamRelease3Var,
+            )
+        else:
+            return
 
-            try:
-                year = int(self.steamRelease1Var.get())
-                month = int(self.steamRelease2Var.get())
-                day = int(self.steamRelease3Var.get())
-            # This happens when the field is empty
-            except ValueError:
-                return
-
-            if validate_date_format(year, month, day):
+        try:
+            year, month, day = (int(var.get()) for var in dateVars)
+        # This happens when the field is empty
+        except ValueError:
+            return
 
-                appSteamReleaseDate = self.get_unix_time(year, month, day)
-                self.set_data_from_section(
-                    appID, appSteamReleaseDate, "common", "steam_release_date"
-                )
+        self.catalog.set_timestamp(appID, key, year, month, day)
 
     def write_data_to_appinfo(self, notice=True):
         self.write_modifications()
 
-        for appId in self.modifiedApps:
-            self.appinfo.update_app(appId)
-
+        self.appinfo.update_apps(self.modifiedApps, config.jobs)
         self.appinfo.write_data()
 
         if notice:
@@ -493,9 +481,58 @@ class MainWindow:
                 message="Your changes " + "have been successfully applied!",
             )
 
+    def save_in_background(self):
+        if self.saveWorker is not None:
+            # The button cancels the save in progress
+            self.saveWorker.cancel()
+            return
+
+        self.update_json_data()
+        self.saveWorker = BackgroundSave(
+            self.appinfo,
+            self.modifiedApps,
+            self.jsonData,
+            f"{config.CONFIG_PATH}/modifications.json",
+            config.jobs,
+        )
+        self.saveWorker.start()
+        self.saveButton.config(text="Cancel")
+        self.check_background_save()
+
+    def check_background_save(self):
+        worker = self.saveWorker
+        if worker.is_alive():
+            self.saveStatusLabel.config(text=worker.status)
+            self.window.after(SAVE_POLL_INTERVAL, self.check_background_save)
+            return
+
+        self.saveWorker = None
+        self.saveButton.config(text="Save")
+        self.saveStatusLabel.config(text="")
+
+        if worker.saved:
+            worker.apply(self.appinfo)
+            messagebox.showinfo(
+                title="Success!",
+                message="Your changes " + "have been successfully applied!",
+            )
+        elif worker.error is not None:
+            messagebox.showerror(
+                title="Error",
+                message=f"Your changes couldn't be saved: {worker.error}",
+            )
+
+        saveQueue, self.saveQueue = self.saveQueue, []
+        for action in saveQueue:
+            action()
+
     def revert_app(self, appId):
         appId = int(appId)
 
+        if self.saveWorker is not None:
+            self.saveQueue.append(lambda: self.revert_app(appId))
+            return
+
         if appId in self.modifiedApps:
             if messagebox.askyesno(
                 title="Revert Game",
@@ -503,57 +540,104 @@ class MainWindow:
                 + "sure you want to revert this game? All your "
                 + "modifications will be erased, this cannot be undone.",
             ):
+                self.revert_apps([appId])
+
+    def revert_all_apps(self):
+        if self.saveWorker is not None:
+            self.saveQueue.append(self.revert_all_apps)
+            return
+
+        if self.modifiedApps and messagebox.askyesno(
+            title="Revert All Games",
+            message="Are you "
+            + "sure you want to revert every modified game? All your "
+            + "modifications will be erased, this cannot be undone.",
+        ):
+            self.revert_apps(list(self.modifiedApps))
+
+    def revert_apps(self, appIds):
+        modifiedData = {
+            appId: self.appinfo.parsedAppInfo[appId]["sections"] for appId in appIds
+        }
+        for appId in appIds:
+            self.restore_original_data(appId)
+
+        # The originals and modifications are only dropped once the
+        # original data is in appinfo.vdf, so a failed write loses
+        # nothing
+        try:
+            self.appinfo.write_data()
+        except CorruptedDataError as error:
+            for appId, sections in modifiedData.items():
+                self.appinfo.parsedAppInfo[appId]["sections"] = sections
+            self.appinfo.update_apps(appIds, config.jobs)
+            messagebox.showerror(
+                title="Error",
+                message=f"The games couldn't be reverted: {error}",
+            )
+            return
+        self.forget_modifications(appIds)
+        self.write_modifications()
+
+        # Update app list
+        self.appList.delete(*self.appList.get_children())
+        self.populate_app_list()
+
+    def restore_original_data(self, appId):
+        originalData = self.originals.load(self.appinfo, appId)
+        if originalData is not None:
+            # Put the original bytes back as they were
+            self.appinfo.replace_app_bytes(appId, originalData)
+        elif "original" in self.jsonData.get(str(appId), {}):
+            # Modifications made before originals were stored apart
+            originalData = deepcopy(self.jsonData[str(appId)]["original"])
+            self.appinfo.parsedAppInfo[appId]["sections"] = originalData
+            self.appinfo.update_app(appId)
 
-                # Fetch original data and replace it
-                originalData = deepcopy(self.jsonData[str(appId)]["original"])
-                self.appinfo.parsedAppInfo[appId]["sections"] = originalData
+    def forget_modifications(self, appIds):
+        self.originals.remove(set(appIds))
+        for appId in appIds:
+            # Edits made before can't be undone on the original data
+            self.catalog.history.forget(appId)
 
-                # Delete app from modified apps
-                # to not save it in the json again
-                if appId in self.modifiedApps:
-                    self.modifiedApps.remove(appId)
+            # Delete app from modified apps
+            # to not save it in the json again
+            if appId in self.modifiedApps:
+                self.modifiedApps.remove(appId)
 
-                # Delete data from json
-                del self.jsonData[str(appId)]
-                self.write_modifications()
+            # Delete data from json
+            self.jsonData.pop(str(appId), None)
 
-                self.appinfo.update_app(appId)
-                self.appinfo.write_data()
+    def undo_edit(self):
+        self.show_changed_app(self.catalog.undo())
 
-                # Update app list
-                self.appList.delete(*self.appList.get_children())
-                self.populate_app_list()
+    def redo_edit(self):
+        self.show_changed_app(self.catalog.redo())
+
+    def show_changed_app(self, appID):
+        # Shows the data of an app changed by undo or redo, if it's the
+        # one being edited
+        if appID is None or str(appID) != self.idVar.get():
+            return
+        self.show_app_data(appID)
+        if self.launchMenuWindow is not None and self.launchMenuWindow.winfo_exists():
+            self.update_launch_menu_window(appID)
 
     def fetch_app_data(self, _event):
         # Data from list
         currentItem = self.appList.focus()
         currentItemData = self.appList.item(currentItem)
-        appID = currentItemData["values"][-1]
-        # Fetched data
-        appName = self.get_data_from_section(appID, "common", "name")
-        appSortAs = self.get_data_from_section(appID, "common", "sortas")
-        appDeveloper = self.get_data_from_section(
-            appID, "extended", "developer"
-        )
-        appPublisher = self.get_data_from_section(
-            appID, "extended", "publisher"
-        )
-        appSteamReleaseDate = self.get_data_from_section(
-            appID, "common", "steam_release_date"
-        )
-        appOgReleaseDate = self.get_data_from_section(
-            appID, "common", "original_release_date"
-        )
+        self.show_app_data(currentItemData["values"][-1])
 
-        if not appSteamReleaseDate:
-            appSteamReleaseDate = 0
-        if not appOgReleaseDate:
-            appOgReleaseDate = appSteamReleaseDate
-        if not appSortAs:
-            appSortAs = appName
-
-        appSteamReleaseDate = datetime.fromtimestamp(appSteamReleaseDate)
-        appOgReleaseDate = datetime.fromtimestamp(appOgReleaseDate)
+    def show_app_data(self, appID):
+        # Fetched data
+        appDetails = self.catalog.get_app_details(appID)
+        appName = appDetails["name"]
+        appSortAs = appDetails["sortas"]
+        appDeveloper = appDetails["developer"]
+        appPublisher = appDetails["publisher"]
+        appSteamReleaseDate = appDetails["steam_release_date"]
+        appOgReleaseDate = appDetails["original_release_date"]
 
         self.idVar.set(appID)
 
@@ -579,42 +663,16 @@ class MainWindow:
         self.set_var_no_callback(
             self.developerVar,
             appDeveloper,
-            lambda _a, _b, _c: (
-                self.set_data_from_section(
-                    int(self.idVar.get()),
-                    self.developerVar.get(),
-                    "extended",
-                    "developer",
-                ),
-                self.set_data_from_section(
-                    int(self.idVar.get()),
-                    self.developerVar.get(),
-                    "common",
-                    "associations",
-                    "0",
-                    "name",
-                ),
+            lambda _a, _b, _c: self.catalog.set_developer(
+                int(self.idVar.get()), self.developerVar.get()
             ),
         )
 
         self.set_var_no_callback(
             self.publisherVar,
             appPublisher,
-            lambda _a, _b, _c: (
-                self.set_data_from_section(
-                    int(self.idVar.get()),
-                    self.publisherVar.get(),
-                    "extended",
-                    "publisher",
-                ),
-                self.set_data_from_section(
-                    int(self.idVar.get()),
-                    self.publisherVar.get(),
-                    "common",
-                    "associations",
-                    "1",
-                    "name",
-                ),
+            lambda _a, _b, _c: self.catalog.set_publisher(
+                int(self.idVar.get()), self.publisherVar.get()
             ),
         )
 
@@ -659,18 +717,28 @@ class MainWindow:
         )
 
     def locate_app_in_list(self):
-        query = self.searchBar.get().lower()
+        query = self.searchBar.get()
 
         # Clear list to fill it with results
         self.appList.delete(*self.appList.get_children())
 
-        if query:
-            for app in self.appData:
-                if query in app[0].lower():
-                    self.insert_app_in_list(app)
+        for app in self.catalog.search(query, self.sortColumn, self.sortReverse):
+            self.insert_app_in_list(app)
+
+    def sort_app_list(self, column):
+        # Clicking the column the list is sorted by reverses it
+        if column == self.sortColumn:
+            self.sortReverse = not self.sortReverse
         else:
-            # Update app list
-            self.populate_app_list()
+            self.sortColumn = column
+            self.sortReverse = False
+
+        arrow = " \u25bc" if self.sortReverse else " \u25b2"
+        for heading, text, headingColumn in APP_LIST_HEADINGS:
+            if headingColumn == column:
+                text += arrow
+            self.appList.heading(heading, text=text)
+        self.locate_app_in_list()
 
     def center_window(self, window):
         screenWidth = window.winfo_screenwidth()
@@ -697,77 +765,38 @@ class MainWindow:
         else:
             self.launchMenuWindow.destroy()
 
-    def move_launch_option(self, appID, optionNumber, direction):
-        launchOption = self.get_data_from_section(
-            appID, "config", "launch", optionNumber
-        )
-
-        if direction == "up":
-            newOptionNumber = str(int(optionNumber) - 1)
-            # Check if the location exists
-            nextLaunchOption = self.get_data_from_section(
-                appID, "config", "launch", newOptionNumber
-            )
+    def get_renumbered_rows(self, optionNumbers):
+        # Moving or deleting an option numbers them all again from 0,
+        # so rows bound to an option that wasn't numbered after its
+        # position have to be bound again too
+        return {
+            index for index, number in enumerate(optionNumbers) if number != str(index)
+        }
 
-            if nextLaunchOption is not False:
-                self.set_data_from_section(
-                    appID, nextLaunchOption, "config", "launch", optionNumber
-                )
-                self.set_data_from_section(
-                    appID, launchOption, "config", "launch", newOptionNumber
-                )
-            else:
-                return
-            self.update_launch_menu_window(appID)
-        elif direction == "down":
-            newOptionNumber = str(int(optionNumber) + 1)
-            # Check if the location exists
-            prevLaunchOption = self.get_data_from_section(
-                appID, "config", "launch", newOptionNumber
-            )
-
-            if prevLaunchOption is not False:
-                self.set_data_from_section(
-                    appID, prevLaunchOption, "config", "launch", optionNumber
-                )
-                self.set_data_from_section(
-                    appID, launchOption, "config", "launch", newOptionNumber
-                )
-            else:
-                return
-            self.update_launch_menu_window(appID)
-        else:
-            return
+    def move_launch_option(self, appID, optionNumber, direction):
+        optionNumbers = list(self.get_data_from_section(appID, "config", "launch"))
+        index = optionNumbers.index(optionNumber)
+        if self.catalog.move_launch_option(appID, optionNumber, direction):
+            # Only the two swapped rows change, unless options get
+            # new numbers
+            newIndex = index - 1 if direction == "up" else index + 1
+            rows = {index, newIndex} | self.get_renumbered_rows(optionNumbers)
+            self.update_launch_menu_window(appID, rows=sorted(rows))
 
     def delete_launch_option(self, appID, optionNumber):
-        launchOptions = self.get_data_from_section(appID, "config", "launch")
-
-        found = False
-        keys = list(launchOptions.keys())
-        for launchOption in keys:
-            if not found:
-                if launchOption == optionNumber:
-                    found = True
-            else:
-                newOptionNumber = str(int(launchOption) - 1)
-                self.set_data_from_section(
-                    appID,
-                    launchOptions[launchOption],
-                    "config",
-                    "launch",
-                    newOptionNumber,
-                )
-        del launchOptions[keys[-1]]
-        self.update_launch_menu_window(appID)
+        optionNumbers = list(self.get_data_from_section(appID, "config", "launch"))
+        index = optionNumbers.index(optionNumber)
+        self.catalog.delete_launch_option(appID, optionNumber)
+        # Rows before the deleted one stay the same, unless options get
+        # new numbers
+        rows = set(range(index, len(self.launchRows)))
+        rows |= self.get_renumbered_rows(optionNumbers[:index])
+        self.update_launch_menu_window(appID, rows=sorted(rows))
 
     def add_launch_option(self, appID):
-        launchOptions = self.get_data_from_section(appID, "config", "launch")
-        newEntryNumber = str(len(launchOptions))
-        self.set_data_from_section(
-            appID, {}, "config", "launch", newEntryNumber
-        )
-
-        self.update_launch_menu_window(appID)
+        self.catalog.add_launch_option(appID)
+        launchOptionCount = len(self.get_data_from_section(appID, "config", "launch"))
+        self.update_launch_menu_window(appID, rows=(launchOptionCount - 1,))
 
     def split_directory(self, directory):
         allparts = []
@@ -814,7 +843,7 @@ class MainWindow:
     def generate_launch_option_string(
         self, appID, execVar, wkngDirVar, pathType
     ):
-        install_path = self.appinfo.parsedAppInfo[appID]["install_path"]
+        install_path = self.installPaths.get(appID, ".")
 
         if pathType == "exe":
             exePath = filedialog.askopenfilename(
@@ -865,85 +894,174 @@ class MainWindow:
             appID, oslist, "config", "launch", launchOption, "config", "oslist"
         )
 
-    def create_launch_option(
-        self,
-        frame,
-        appID,
-        number,
-        description,
-        executable,
-        wkngDir,
-        arguments,
-        platforms,
-    ):
+    def update_launch_menu_window(self, appID, rows=None):
+        """
+        Shows a row for every launch option of the app. Rows are created
+        once and kept, when options are added, moved or deleted only the
+        given row indexes (all of them if None) are bound to their
+        option again, and rows left over are hidden.
+        """
+        appLaunchOptions = self.get_data_from_section(appID, "config", "launch")
+        optionNumbers = list(appLaunchOptions) if appLaunchOptions else []
+
+        while len(self.launchRows) < len(optionNumbers):
+            self.launchRows.append(
+                LaunchOptionRow(self.scrollFrame.scrollableFrame, self)
+            )
+
+        if rows is None:
+            rows = range(len(self.launchRows))
+        for index in rows:
+            row = self.launchRows[index]
+            if index >= len(optionNumbers):
+                row.pack_forget()
+                continue
+            row.bind_option(appID, optionNumbers[index])
+            if not row.winfo_manager():
+                row.pack(expand=True)
+
+        if not optionNumbers:
+            self.ask_to_create_launch_option(appID)
+            return
+
+        # Offsets size of scrollbar and
+        # takes padding into account
+        padding = 10
+        self.scrollFrame.scrollbar.update()
+        firstRow = self.launchRows[0]
+        width = (
+            firstRow.winfo_reqwidth()
+            + LaunchOptionRow.PADDING
+            + self.scrollFrame.scrollbar.winfo_reqwidth()
+        )
+        height = (
+            firstRow.winfo_reqheight() * min(len(optionNumbers), 2)
+            + LaunchOptionRow.PADDING * 2
+            + self.newEntryFrame.winfo_reqheight()
+            + padding
+        )
+
+        # Resizes window depending on the number of launch options
+        self.scrollFrame.canvas.config(width=width, height=height)
+
+    def create_launch_menu_window(self):
+        appName = self.nameVar.get()
+        appID = int(self.idVar.get())
+
+        self.launchMenuWindow = tk.Toplevel(self.window)
+        self.launchMenuWindow.resizable(False, False)
+        self.launchMenuWindow.title(
+            f"Launch Menu Editor for {appName} ({appID})"
+        )
+
+        self.scrollFrame = ScrollableFrame(self.launchMenuWindow)
+        self.scrollFrame.scrollableFrame.config(bg=config.BG, padx=20, pady=20)
+        self.launchRows = []
+
+        # Add widgets for adding new entries
+        self.newEntryFrame = Frame(self.scrollFrame.scrollableFrame)
+        newEntryButton = Button(
+            self.newEntryFrame,
+            text="Add New Entry",
+            command=lambda: self.add_launch_option(appID),
+        )
+        newEntryButton.pack(side="top", anchor="n")
+        self.newEntryFrame.pack(side="bottom", pady=(10, 0))
+
+        self.update_launch_menu_window(appID)
+
+        self.scrollFrame.pack()
+
+        self.launchMenuWindow.update()
+        self.center_window(self.launchMenuWindow)
+        # Prevent the use of the main window while this one exists
+        self.launchMenuWindow.grab_set()
+        self.launchMenuWindow.mainloop()
+
+    def populate_app_list(self):
+        # Get all applications found in appinfo.vdf
+        self.catalog.build_app_list()
+        self.locate_app_in_list()
+
+
+class LaunchOptionRow(LabelFrame):
+    """
+    The widgets of a single launch option. Its callbacks read the option
+    it's bound to when they run, so the row can be bound to another
+    option instead of being created again.
+    """
+
+    PADDING = 20
+
+    def __init__(self, parent, editor):
+        padding = self.PADDING
+        LabelFrame.__init__(self, parent, padx=padding, pady=padding)
+        self.editor = editor
+        self.appID = None
+        self.number = None
+        # Set while the row is filled, so it doesn't write anything
+        self.binding = False
 
         # Frames
-        padding = 20
-        mainFrame = LabelFrame(
-            frame,
-            padx=padding,
-            pady=padding,
-            text=number,
-        )
-        descFrame = Frame(mainFrame, padx=padding)
-        execFrame = Frame(mainFrame, padx=padding)
-        wkngDirFrame = Frame(mainFrame, padx=padding)
-        argFrame = Frame(mainFrame, padx=padding)
-        platformFrame = Frame(mainFrame, padx=padding)
-        buttonsFrame = Frame(mainFrame, padx=padding)
+        descFrame = Frame(self, padx=padding)
+        execFrame = Frame(self, padx=padding)
+        wkngDirFrame = Frame(self, padx=padding)
+        argFrame = Frame(self, padx=padding)
+        platformFrame = Frame(self, padx=padding)
+        buttonsFrame = Frame(self, padx=padding)
 
         # String vars
-        descVar = tk.StringVar()
-        wkngDirVar = tk.StringVar()
-        execVar = tk.StringVar()
-        argVar = tk.StringVar()
+        self.descVar = tk.StringVar()
+        self.wkngDirVar = tk.StringVar()
+        self.execVar = tk.StringVar()
+        self.argVar = tk.StringVar()
 
-        winVar = tk.BooleanVar()
-        linVar = tk.BooleanVar()
-        macVar = tk.BooleanVar()
+        self.winVar = tk.BooleanVar()
+        self.linVar = tk.BooleanVar()
+        self.macVar = tk.BooleanVar()
 
         # Widgets
         descLabel = Label(descFrame, text="Description:")
         descEntry = Entry(
             descFrame,
-            textvariable=descVar,
+            textvariable=self.descVar,
             width=60,
         )
 
         execLabel = Label(execFrame, text="Executable:")
         execEntry = Entry(
             execFrame,
-            textvariable=execVar,
+            textvariable=self.execVar,
             width=55,
             state="readonly",
         )
         execButton = Button(
             execFrame,
             text="...",
-            command=lambda: self.generate_launch_option_string(
-                appID, execVar, wkngDirVar, "exe"
+            command=lambda: editor.generate_launch_option_string(
+                self.appID, self.execVar, self.wkngDirVar, "exe"
             ),
         )
 
         wkngDirLabel = Label(wkngDirFrame, text="Working Directory:")
         wkngDirEntry = Entry(
             wkngDirFrame,
-            textvariable=wkngDirVar,
+            textvariable=self.wkngDirVar,
             width=55,
             state="readonly",
         )
         wkngDirButton = Button(
             wkngDirFrame,
             text="...",
-            command=lambda: self.generate_launch_option_string(
-                appID, execVar, wkngDirVar, "wkngDir"
+            command=lambda: editor.generate_launch_option_string(
+                self.appID, self.execVar, self.wkngDirVar, "wkngDir"
             ),
         )
 
         argLabel = Label(argFrame, text="Launch Arguments:")
         argEntry = Entry(
             argFrame,
-            textvariable=argVar,
+            textvariable=self.argVar,
             width=60,
         )
 
@@ -951,33 +1069,35 @@ class MainWindow:
         winCheck = Checkbutton(
             platformFrame,
             text="Windows",
-            variable=winVar,
+            variable=self.winVar,
         )
         linCheck = Checkbutton(
             platformFrame,
             text="Linux",
-            variable=linVar,
+            variable=self.linVar,
         )
         macCheck = Checkbutton(
             platformFrame,
             text="Mac",
-            variable=macVar,
+            variable=self.macVar,
         )
 
         deleteButton = DeleteButton(
             buttonsFrame,
-            image=self.deleteImage,
-            command=lambda: self.delete_launch_option(appID, number),
+            image=editor.deleteImage,
+            command=lambda: editor.delete_launch_option(self.appID, self.number),
         )
         upButton = Button(
             buttonsFrame,
-            image=self.upArrowImage,
-            command=lambda: self.move_launch_option(appID, number, "up"),
+            image=editor.upArrowImage,
+            command=lambda: editor.move_launch_option(self.appID, self.number, "up"),
         )
         downButton = Button(
             buttonsFrame,
-            image=self.downArrowImage,
-            command=lambda: self.move_launch_option(appID, number, "down"),
+            image=editor.downArrowImage,
+            command=lambda: editor.move_launch_option(
+                self.appID, self.number, "down"
+            ),
         )
 
         # Pack widgets
@@ -1004,7 +1124,6 @@ class MainWindow:
         upButton.pack(side="right")
 
         # Pack frames
-        mainFrame.pack(expand=True)
         descFrame.pack(side="top", fill="both", pady=(padding, 0))
         execFrame.pack(side="top", fill="both")
         wkngDirFrame.pack(side="top", fill="both")
@@ -1012,200 +1131,53 @@ class MainWindow:
         platformFrame.pack(side="top")
         buttonsFrame.pack(side="top", fill="both", pady=(0, padding))
 
-        # Insert data
-        for platform in platforms.split(","):
-            if platform == "windows":
-                winVar.set(True)
-            elif platform == "linux":
-                linVar.set(True)
-            elif platform == "macos":
-                macVar.set(True)
-
-        winVar.trace_add(
-            "write",
-            lambda _a, _b, _c: self.write_os_list(
-                appID, winVar, macVar, linVar, number
-            ),
-        )
-        linVar.trace_add(
-            "write",
-            lambda _a, _b, _c: self.write_os_list(
-                appID, winVar, macVar, linVar, number
-            ),
-        )
-        macVar.trace_add(
-            "write",
-            lambda _a, _b, _c: self.write_os_list(
-                appID, winVar, macVar, linVar, number
-            ),
-        )
-
-        self.set_var_no_callback(
-            descVar,
-            description,
-            lambda _a, _b, _c: self.set_data_from_section(
-                appID, descVar.get(), "config", "launch", number, "description"
-            ),
-        )
-
-        self.set_var_no_callback(
-            wkngDirVar,
-            wkngDir,
-            lambda _a, _b, _c: self.set_data_from_section(
-                appID,
-                wkngDirVar.get(),
-                "config",
-                "launch",
-                number,
-                "workingdir",
-            ),
-        )
-
-        self.set_var_no_callback(
-            execVar,
-            executable,
-            lambda _a, _b, _c: self.set_data_from_section(
-                appID, execVar.get(), "config", "launch", number, "executable"
-            ),
-        )
-
-        self.set_var_no_callback(
-            argVar,
-            arguments,
-            lambda _a, _b, _c: self.set_data_from_section(
-                appID, argVar.get(), "config", "launch", number, "arguments"
-            ),
-        )
-
-        # Update to return correct values
-        mainFrame.update()
-        return [
-            mainFrame.winfo_reqwidth() + padding,
-            mainFrame.winfo_reqheight(),
-            padding,
-        ]
-
-    def update_launch_menu_window(self, appID):
-        # Clear frame and store current scroll position
-        scrollbarPosition = 0
-        for widget in self.scrollFrame.scrollableFrame.winfo_children():
-            scrollbarPosition = self.scrollFrame.scrollbar.get()[0]
-            widget.destroy()
-
-        # Read launch options and gather data
-        appLaunchOptions = self.get_data_from_section(
-            appID, "config", "launch"
-        )
-        if not appLaunchOptions:
-            self.ask_to_create_launch_option(appID)
-            return
-
-        frameCount = 0
-        for launchOption in appLaunchOptions.keys():
-            description = self.get_data_from_section(
-                appID, "config", "launch", launchOption, "description"
-            )
-            executable = self.get_data_from_section(
-                appID, "config", "launch", launchOption, "executable"
-            )
-            wkngDir = self.get_data_from_section(
-                appID, "config", "launch", launchOption, "workingdir"
-            )
-            arguments = self.get_data_from_section(
-                appID, "config", "launch", launchOption, "arguments"
-            )
-            platforms = self.get_data_from_section(
-                appID,
-                "config",
-                "launch",
-                launchOption,
-                "config",
-                "oslist",
-                error="Not specified",
+        for var in (self.winVar, self.linVar, self.macVar):
+            var.trace_add("write", lambda _a, _b, _c: self.write_os_list())
+        for var, key in (
+            (self.descVar, "description"),
+            (self.wkngDirVar, "workingdir"),
+            (self.execVar, "executable"),
+            (self.argVar, "arguments"),
+        ):
+            var.trace_add(
+                "write",
+                lambda _a, _b, _c, var=var, key=key: self.write_field(var, key),
             )
 
-            geometry = self.create_launch_option(
-                self.scrollFrame.scrollableFrame,
-                appID,
-                launchOption,
-                description,
-                executable,
-                wkngDir,
-                arguments,
-                platforms,
+    def write_field(self, var, key):
+        if not self.binding:
+            self.editor.set_data_from_section(
+                self.appID, var.get(), "config", "launch", self.number, key
             )
 
-            if frameCount < 2:
-                frameCount += 1
-
-        # Add widgets for adding new entries
-        newEntryFrame = Frame(self.scrollFrame.scrollableFrame)
-        newEntryButton = Button(
-            newEntryFrame,
-            text="Add New Entry",
-            command=lambda: self.add_launch_option(appID),
-        )
-
-        padding = 10
-        newEntryButton.pack(side="top", anchor="n")
-        newEntryFrame.pack(side="bottom", pady=(padding, 0))
-
-        # Offsets size of scrollbar and
-        # takes padding (geometry[2]) into account
-        self.scrollFrame.scrollbar.update()
-        geometry[0] += self.scrollFrame.scrollbar.winfo_reqwidth()
-        geometry[1] *= frameCount
-        geometry[1] += geometry[2] * 2
-        geometry[1] += newEntryFrame.winfo_reqheight() + padding
-
-        # Resizes window depending on the number of launch options
-        self.scrollFrame.canvas.config(width=geometry[0], height=geometry[1])
-        self.scrollFrame.canvas.yview_moveto(scrollbarPosition)
-
-    def create_launch_menu_window(self):
-        appName = self.nameVar.get()
-        appID = int(self.idVar.get())
-
-        self.launchMenuWindow = tk.Toplevel(self.window)
-        self.launchMenuWindow.resizable(False, False)
-        self.launchMenuWindow.title(
-            f"Launch Menu Editor for {appName} ({appID})"
-        )
-
-        self.scrollFrame = ScrollableFrame(self.launchMenuWindow)
-        self.scrollFrame.scrollableFrame.config(bg=config.BG, padx=20, pady=20)
-
-        self.update_launch_menu_window(appID)
-
-        self.scrollFrame.pack()
-
-        self.launchMenuWindow.update()
-        self.center_window(self.launchMenuWindow)
-        # Prevent the use of the main window while this one exists
-        self.launchMenuWindow.grab_set()
-        self.launchMenuWindow.mainloop()
-
-    def populate_app_list(self):
-        # Get all applications found in appinfo.vdf
-        keys = list(self.appinfo.parsedAppInfo.keys())
+    def write_os_list(self):
+        if not self.binding:
+            self.editor.write_os_list(
+                self.appID, self.winVar, self.macVar, self.linVar, self.number
+            )
 
-        self.appData = []
+    def bind_option(self, appID, number):
+        self.binding = True
+        self.appID = appID
+        self.number = number
+        self.config(text=number)
 
-        for app in keys[2:]:
-            appID = app
-            appType = self.get_data_from_section(appID, "common", "type")
-            modified = appID in self.modifiedApps
-            appName = self.get_data_from_section(appID, "common", "name")
-            if not appName or not appType:
-                pass
-            else:
-                self.appData.append([str(appName), appType, modified, appID])
-
-        # Sort case-insensitive
-        self.appData.sort(key=lambda x: str(x[0]).lower())
+        def get_option_data(*sections, error=""):
+            return self.editor.get_data_from_section(
+                appID, "config", "launch", number, *sections, error=error
+            )
 
-        for app in self.appData:
-            self.insert_app_in_list(app)
+        self.descVar.set(get_option_data("description"))
+        self.execVar.set(get_option_data("executable"))
+        self.wkngDirVar.set(get_option_data("workingdir"))
+        self.argVar.set(get_option_data("arguments"))
+
+        platforms = get_option_data("config", "oslist", error="Not specified")
+        platforms = platforms.split(",")
+        self.winVar.set("windows" in platforms)
+        self.linVar.set("linux" in platforms)
+        self.macVar.set("macos" in platforms)
+        self.binding = False
 
 
 class LoadingWindow(tk.Toplevel):
@@ -0,0 +1,220 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from itertools import accumulate, chain
+from struct import iter_unpack
+
+# NumPy is optional, without it the table is kept in plain lists
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+HEADER_FORMAT = "<4IQ20sI20s"
+
+HEADER_FIELDS = [
+    "appid",
+    "size",
+    "state",
+    "last_update",
+    "access_token",
+    "checksum_text",
+    "change_number",
+    "checksum_binary",
+]
+
+if np is not None:
+    # Same layout as the header in the file, so it can be loaded
+    # straight from the raw bytes
+    HEADER_DTYPE = np.dtype([
+        ("appid", "<u4"),
+        ("size", "<u4"),
+        ("state", "<u4"),
+        ("last_update", "<u4"),
+        ("access_token", "<u8"),
+        ("checksum_text", "V20"),
+        ("change_number", "<u4"),
+        ("checksum_binary", "V20"),
+    ])
+
+
+class HeaderTable:
+    """
+    Table with the header of every app in appinfo.vdf, in file order.
+    Headers are read in a single walk over the app boundaries. When
+    NumPy is available they are stored in a structured array so lookups,
+    sorting, filtering and diffing run vectorized, otherwise plain lists
+    are used.
+    """
+
+    def __init__(self, appinfo, use_numpy=True):
+        self.use_numpy = use_numpy and np is not None
+        raw_headers = b"".join(appinfo.iter_raw_apps(header_only=True))
+        apps_start = appinfo.get_apps_start()
+
+        if self.use_numpy:
+            self.headers = np.frombuffer(raw_headers, dtype=HEADER_DTYPE)
+            # Apps are stored back to back, so each one starts where
+            # the previous one ended
+            self.offsets = np.empty(len(self.headers), dtype=np.int64)
+            if len(self.headers):
+                self.offsets[0] = apps_start
+                np.cumsum(
+                    self.headers["size"][:-1].astype(np.int64) + 8,
+                    out=self.offsets[1:],
+                )
+                self.offsets[1:] += apps_start
+            self.sorted_indexes = np.argsort(self.headers["appid"], kind="stable")
+        else:
+            self.headers = list(iter_unpack(HEADER_FORMAT, raw_headers))
+            # accumulate has no initial argument before Python 3.8
+            self.offsets = list(
+                accumulate(
+                    chain([apps_start], (header[1] + 8 for header in self.headers[:-1]))
+                )
+            ) if self.headers else []
+            self.indexes = {
+                header[0]: index for index, header in enumerate(self.headers)
+            }
+
+    def __len__(self):
+        return len(self.headers)
+
+    def __contains__(self, app_id):
+        return self.find(app_id) != -1
+
+    def get_appids(self):
+        if self.use_numpy:
+            return self.headers["appid"].tolist()
+        return [header[0] for header in self.headers]
+
+    def find(self, app_id):
+        # Returns the row of the given app, or -1 if it's not there
+        if not self.use_numpy:
+            return self.indexes.get(app_id, -1)
+
+        appids = self.headers["appid"]
+        position = np.searchsorted(appids, app_id, sorter=self.sorted_indexes)
+        if position == len(appids):
+            return -1
+        index = int(self.sorted_indexes[position])
+        return index if appids[index] == app_id else -1
+
+    def get_header(self, app_id):
+        """
+        Returns the header of the given app in the same format as
+        Appinfo.read_header, plus its offset in the file.
+        """
+        index = self.find(app_id)
+        if index == -1:
+            raise KeyError(app_id)
+
+        if self.use_numpy:
+            row = self.headers[index]
+            header = {}
+            for key in HEADER_FIELDS:
+                value = row[key]
+                header[key] = value.tobytes() if key.startswith("checksum") else int(value)
+        else:
+            header = dict(zip(HEADER_FIELDS, self.headers[index]))
+        header["offset"] = int(self.offsets[index])
+        return header
+
+    def sort_appids(self, field="appid", reverse=False):
+        if self.use_numpy:
+            order = np.argsort(self.headers[field], kind="stable")
+            if reverse:
+                order = order[::-1]
+            return self.headers["appid"][order].tolist()
+
+        column = HEADER_FIELDS.index(field)
+        return [
+            header[0]
+            for header in sorted(
+                self.headers, key=lambda header: header[column], reverse=reverse
+            )
+        ]
+
+    def select_appids(self, state=None, updated_after=None, updated_before=None):
+        """
+        Returns the appids matching every given filter, in file order.
+        """
+        if self.use_numpy:
+            mask = np.ones(len(self.headers), dtype=bool)
+            if state is not None:
+                mask &= self.headers["state"] == state
+            if updated_after is not None:
+                mask &= self.headers["last_update"] > updated_after
+            if updated_before is not None:
+                mask &= self.headers["last_update"] < updated_before
+            return self.headers["appid"][mask].tolist()
+
+        return [
+            header[0]
+            for header in self.headers
+            if (state is None or header[2] == state)
+            and (updated_after is None or header[3] > updated_after)
+            and (updated_before is None or header[3] < updated_before)
+        ]
+
+    def get_versions(self):
+        # Maps every appid to its checksum_binary and change_number
+        if self.use_numpy:
+            return {
+                int(header["appid"]): (
+                    header["checksum_binary"].tobytes(),
+                    int(header["change_number"]),
+                )
+                for header in self.headers
+            }
+        return {header[0]: (header[7], header[6]) for header in self.headers}
+
+    def diff(self, previous):
+        """
+        Compares this table against an older one. Returns the added,
+        removed and changed appids, an app counts as changed when its
+        checksum_binary or change_number differ.
+        """
+        if self.use_numpy and previous.use_numpy:
+            current_ids = self.headers["appid"]
+            previous_ids = previous.headers["appid"]
+            common, current_rows, previous_rows = np.intersect1d(
+                current_ids, previous_ids, return_indices=True
+            )
+            current = self.headers[current_rows]
+            old = previous.headers[previous_rows]
+            changed = (
+                (current["checksum_binary"] != old["checksum_binary"])
+                | (current["change_number"] != old["change_number"])
+            )
+            return (
+                np.setdiff1d(current_ids, previous_ids).tolist(),
+                np.setdiff1d(previous_ids, current_ids).tolist(),
+                common[changed].tolist(),
+            )
+
+        current = self.get_versions()
+        old = previous.get_versions()
+        return (
+            sorted(current.keys() - old.keys()),
+            sorted(old.keys() - current.keys()),
+            sorted(
+                app_id
+                for app_id in current.keys() & old.keys()
+                if current[app_id] != old[app_id]
+            ),
+        )
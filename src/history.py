@@ -0,0 +1,265 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import zlib
+from datetime import datetime
+from hashlib import sha1
+from struct import pack, unpack
+
+from appinfo import APPINFO_29, APP_HEADER_SIZE
+
+
+PACK_MAGIC = b"SMEPACK\x00"
+MANIFEST_MAGIC = b"SMESNAP\x00"
+# Key (SHA-1 of the data) and compressed size
+OBJECT_HEADER_SIZE = 24
+KEY_SIZE = 20
+
+
+class HistoryError(Exception):
+    pass
+
+
+class HistoryStore:
+    """
+    Keeps every version of every app seen in appinfo.vdf. App bodies
+    are stored once, compressed, in a pack file keyed by their SHA-1,
+    which is the checksum_binary of their header. Each snapshot only
+    adds the bodies the pack doesn't have yet, plus a manifest with the
+    headers of the apps in file order, which is enough to put the whole
+    file back together byte by byte.
+
+    The bytes before the first app and after the last one (the string
+    table on APPINFO_29) are stored as objects too.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pack_path = os.path.join(path, "objects.pack")
+        self.manifests_path = os.path.join(path, "manifests")
+        # key -> offset of the compressed data and its size
+        self.objects = {}
+        self.load_index()
+
+    def __contains__(self, key):
+        return key in self.objects
+
+    def load_index(self):
+        try:
+            with open(self.pack_path, "rb") as pack_file:
+                if pack_file.read(len(PACK_MAGIC)) != PACK_MAGIC:
+                    raise HistoryError(f"{self.pack_path} is not a pack file")
+                pack_size = os.fstat(pack_file.fileno()).st_size
+                offset = len(PACK_MAGIC)
+                while True:
+                    object_header = pack_file.read(OBJECT_HEADER_SIZE)
+                    if len(object_header) < OBJECT_HEADER_SIZE:
+                        break
+                    key, size = unpack("<20sI", object_header)
+                    offset += OBJECT_HEADER_SIZE
+                    # An object cut short by a crash is ignored, and
+                    # written again by the next snapshot
+                    if offset + size > pack_size:
+                        break
+                    self.objects[key] = (offset, size)
+                    offset += size
+                    pack_file.seek(offset)
+                self.pack_end = offset
+        except FileNotFoundError:
+            self.pack_end = None
+
+    def add_objects(self, objects):
+        """
+        Appends the given (key, data) pairs to the pack, skipping the
+        ones it already has.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.pack_path, "r+b" if self.pack_end else "wb") as pack_file:
+            if self.pack_end is None:
+                pack_file.write(PACK_MAGIC)
+                self.pack_end = len(PACK_MAGIC)
+            else:
+                # Drops whatever a crash left after the last object
+                pack_file.truncate(self.pack_end)
+            pack_file.seek(self.pack_end)
+
+            for key, data in objects:
+                if key in self.objects:
+                    continue
+                compressed = zlib.compress(data)
+                pack_file.write(pack("<20sI", key, len(compressed)) + compressed)
+                self.objects[key] = (self.pack_end + OBJECT_HEADER_SIZE, len(compressed))
+                self.pack_end += OBJECT_HEADER_SIZE + len(compressed)
+
+    def read_object(self, pack_file, key):
+        try:
+            offset, size = self.objects[key]
+        except KeyError:
+            raise HistoryError(f"Object {key.hex()} is missing from the pack")
+        pack_file.seek(offset)
+        data = zlib.decompress(pack_file.read(size))
+        if sha1(data).digest() != key:
+            raise HistoryError(f"Object {key.hex()} is corrupted")
+        return data
+
+    def get_snapshots(self):
+        # Oldest first, snapshots taken in the same second get a -N suffix
+        def get_order(name):
+            parts = name[:-len(".manifest")].split("-")
+            return parts[0], parts[1], int(parts[2]) if len(parts) > 2 else 1
+
+        try:
+            names = os.listdir(self.manifests_path)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            (name for name in names if name.endswith(".manifest")), key=get_order
+        )
+
+    def encode_manifest(self, prefix_key, headers, tail_key, overrides):
+        return zlib.compress(
+            MANIFEST_MAGIC
+            + prefix_key
+            + tail_key
+            + pack("<2I", len(headers), len(overrides))
+            + b"".join(headers)
+            + b"".join(pack("<I20s", index, key) for index, key in overrides.items())
+        )
+
+    def decode_manifest(self, data):
+        try:
+            data = zlib.decompress(data)
+        except zlib.error:
+            raise HistoryError("Corrupted manifest")
+        if data[:len(MANIFEST_MAGIC)] != MANIFEST_MAGIC:
+            raise HistoryError("Not a manifest")
+
+        offset = len(MANIFEST_MAGIC)
+        prefix_key = data[offset:offset + KEY_SIZE]
+        tail_key = data[offset + KEY_SIZE:offset + KEY_SIZE * 2]
+        offset += KEY_SIZE * 2
+        app_count, override_count = unpack("<2I", data[offset:offset + 8])
+        offset += 8
+
+        headers = [
+            data[start:start + APP_HEADER_SIZE]
+            for start in range(offset, offset + app_count * APP_HEADER_SIZE, APP_HEADER_SIZE)
+        ]
+        offset += app_count * APP_HEADER_SIZE
+        overrides = {}
+        for _ in range(override_count):
+            index, key = unpack("<I20s", data[offset:offset + 24])
+            overrides[index] = key
+            offset += 24
+        return prefix_key, headers, tail_key, overrides
+
+    def snapshot(self, vdf_path):
+        """
+        Records the current state of appinfo.vdf. Bodies whose
+        checksum_binary is already in the pack are skipped without
+        being read. New bodies are hashed, and the few whose
+        checksum_binary doesn't match their data are stored under their
+        real SHA-1, noted in the manifest.
+
+        Returns the name of the snapshot (None if nothing changed since
+        the last one) and the number of new objects.
+        """
+        headers = []
+        overrides = {}
+        new_objects = {}
+
+        with open(vdf_path, "rb") as vdf:
+            prefix = vdf.read(8)
+            if len(prefix) < 8:
+                raise HistoryError(f"{vdf_path} is too short to be an appinfo.vdf file")
+            version = unpack("<Q", prefix)[0]
+            if version == APPINFO_29:
+                prefix += vdf.read(8)
+
+            while True:
+                # The last appid is 0 and has no data. It's followed by
+                # the string table on APPINFO_29 and by nothing on
+                # APPINFO_28, and whatever comes after the apps is kept
+                # in the tail, like a header cut short.
+                header = vdf.read(4)
+                if len(header) == 4 and unpack("<I", header)[0] != 0:
+                    header += vdf.read(APP_HEADER_SIZE - 4)
+                if len(header) < APP_HEADER_SIZE:
+                    vdf.seek(-len(header), os.SEEK_CUR)
+                    break
+
+                size = unpack("<I", header[4:8])[0]
+                checksum = header[-KEY_SIZE:]
+                body_size = size + 8 - APP_HEADER_SIZE
+                if checksum in self.objects or checksum in new_objects:
+                    vdf.seek(body_size, os.SEEK_CUR)
+                else:
+                    body = vdf.read(body_size)
+                    key = sha1(body).digest()
+                    if key != checksum:
+                        overrides[len(headers)] = key
+                    new_objects[key] = body
+                headers.append(header)
+
+            tail = vdf.read()
+
+        prefix_key = sha1(prefix).digest()
+        tail_key = sha1(tail).digest()
+        new_objects[prefix_key] = prefix
+        new_objects[tail_key] = tail
+        new_count = sum(key not in self.objects for key in new_objects)
+        self.add_objects(new_objects.items())
+
+        manifest = self.encode_manifest(prefix_key, headers, tail_key, overrides)
+        snapshots = self.get_snapshots()
+        if snapshots:
+            with open(os.path.join(self.manifests_path, snapshots[-1]), "rb") as last:
+                if last.read() == manifest:
+                    return None, new_count
+
+        name = base_name = datetime.now().strftime("%Y%m%d-%H%M%S")
+        suffix = 1
+        while f"{name}.manifest" in snapshots:
+            suffix += 1
+            name = f"{base_name}-{suffix}"
+        os.makedirs(self.manifests_path, exist_ok=True)
+        manifest_path = os.path.join(self.manifests_path, f"{name}.manifest")
+        with open(f"{manifest_path}.tmp", "wb") as manifest_file:
+            manifest_file.write(manifest)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+        return name, new_count
+
+    def restore(self, name, output_path):
+        """
+        Writes the appinfo.vdf of the given snapshot to output_path.
+        """
+        if not name.endswith(".manifest"):
+            name = f"{name}.manifest"
+        try:
+            with open(os.path.join(self.manifests_path, name), "rb") as manifest_file:
+                manifest = manifest_file.read()
+        except FileNotFoundError:
+            raise HistoryError(f"No snapshot named {name[:-len('.manifest')]}")
+        prefix_key, headers, tail_key, overrides = self.decode_manifest(manifest)
+
+        with open(self.pack_path, "rb") as pack_file, open(output_path, "wb") as output:
+            output.write(self.read_object(pack_file, prefix_key))
+            for index, header in enumerate(headers):
+                output.write(header)
+                key = overrides.get(index, header[-KEY_SIZE:])
+                output.write(self.read_object(pack_file, key))
+            output.write(self.read_object(pack_file, tail_key))
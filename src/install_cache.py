@@ -0,0 +1,119 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import json
+from json import JSONDecodeError
+
+from vdf_text import load, get_app_libraries, read_app_manifest, TextVDFError
+
+
+def get_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def probe_install_path(library, app, install_dir):
+    install_path = os.path.join(library, "steamapps", "common", install_dir)
+    if install_dir and os.path.exists(install_path):
+        return install_path
+
+    # The manifest has the directory Steam actually used
+    try:
+        install_dir = read_app_manifest(library, app).get("installdir")
+    except (OSError, TextVDFError):
+        return None
+    if not install_dir:
+        return None
+    install_path = os.path.join(library, "steamapps", "common", install_dir)
+    return install_path if os.path.exists(install_path) else None
+
+
+class InstallCache:
+    """
+    Remembers where every installed app is, so the install directories
+    don't have to be probed on every startup. libraryfolders.vdf is only
+    parsed again when its mtime changes, and the apps of a library are
+    only probed again when its steamapps directory changes, which
+    happens whenever an app manifest is added or removed.
+    """
+
+    def __init__(self, path, libraryfolders_path):
+        self.path = path
+        self.libraryfolders_path = libraryfolders_path
+        self.data = self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as cache:
+                data = json.load(cache)
+        except (FileNotFoundError, JSONDecodeError):
+            return {"mtime": None, "libraries": {}}
+        return data
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w") as cache:
+            json.dump(self.data, cache)
+
+    def read_libraries(self):
+        # Maps every library to the appids installed in it
+        libraries = {}
+        for app, library in get_app_libraries(load(self.libraryfolders_path)).items():
+            libraries.setdefault(library, []).append(app)
+        return libraries
+
+    def get_install_paths(self, get_install_dir):
+        """
+        Returns a dictionary mapping the appid of every installed app to
+        its install path. get_install_dir is called with an appid to get
+        the installdir it has in appinfo.vdf.
+        """
+        changed = False
+
+        mtime = get_mtime(self.libraryfolders_path)
+        if mtime != self.data["mtime"]:
+            libraries = {}
+            for library, app_ids in self.read_libraries().items():
+                apps = {str(app) for app in app_ids}
+                cached = self.data["libraries"].get(library)
+                if cached is None or cached["apps"].keys() != apps:
+                    # Probed again below
+                    cached = {"mtime": None, "apps": dict.fromkeys(apps)}
+                libraries[library] = cached
+            self.data = {"mtime": mtime, "libraries": libraries}
+            changed = True
+
+        install_paths = {}
+        for library, cached in self.data["libraries"].items():
+            library_mtime = get_mtime(os.path.join(library, "steamapps"))
+            if library_mtime != cached["mtime"]:
+                cached["mtime"] = library_mtime
+                cached["apps"] = {
+                    app: probe_install_path(library, app, get_install_dir(int(app)))
+                    for app in cached["apps"]
+                }
+                changed = True
+
+            for app, install_path in cached["apps"].items():
+                if install_path is not None:
+                    install_paths[int(app)] = install_path
+
+        if changed:
+            self.save()
+        return install_paths
@@ -23,15 +23,19 @@
 #                                #
 ##################################
 
+import sys
 from tkinter import messagebox
 
 from config import config
 from gui.main_window import MainWindow
-from appinfo import IncompatibleVDFError
+from appinfo import CorruptedDataError, IncompatibleVDFError
+from commands import run_command
 
 
 def main():
     try:
+        if run_command():
+            return
         main_window = MainWindow()
         if not config.silent and config.export is None:
             main_window.window.mainloop()
@@ -40,6 +44,8 @@ def main():
             title="Invalid VDF Version",
             message=f"VDF version {e.vdf_version:#08x} is not supported.",
         )
+    except CorruptedDataError as e:
+        sys.exit(f"appinfo.vdf wasn't written, the new data is corrupted: {e}")
 
 
 if __name__ == "__main__":
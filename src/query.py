@@ -0,0 +1,237 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import re
+import operator
+
+from catalog import get_unix_time
+
+
+# Parentheses, operators, quoted strings and words
+TOKEN_REGEX = re.compile(
+    r"""\s*(?:([()])|(==|!=|<=|>=|<|>|~)|"((?:[^"\\]|\\.)*)"|'((?:[^'\\]|\\.)*)'"""
+    r"""|([^\s()"'=!<>~]+))"""
+)
+INTEGER_REGEX = re.compile(r"-?[0-9]+")
+DATE_REGEX = re.compile(r"([0-9]{4})-([0-9]{2})-([0-9]{2})")
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+# Short names for the indexed key paths
+ALIASES = {
+    "name": "common/name",
+    "type": "common/type",
+    "sortas": "common/sortas",
+    "developer": "extended/developer",
+    "publisher": "extended/publisher",
+    "steam_release_date": "common/steam_release_date",
+    "original_release_date": "common/original_release_date",
+    "oslist": "common/oslist",
+}
+KEYWORDS = ("and", "or", "not")
+
+
+class QueryError(Exception):
+    pass
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_REGEX.match(text, position)
+        if match is None:
+            raise QueryError(f"Unexpected character at {position}: {text[position:]!r}")
+        position = match.end()
+        paren, op, double_quoted, single_quoted, word = match.groups()
+        if paren or op:
+            tokens.append(("symbol", paren or op))
+        elif double_quoted is not None or single_quoted is not None:
+            string = double_quoted if double_quoted is not None else single_quoted
+            tokens.append(("string", re.sub(r"\\(.)", r"\1", string)))
+        elif word.lower() in KEYWORDS:
+            tokens.append(("keyword", word.lower()))
+        else:
+            tokens.append(("word", word))
+    return tokens
+
+
+def parse_literal(kind, text):
+    # Words can be numbers or YYYY-MM-DD dates, quoted strings are
+    # always strings
+    if kind == "string":
+        return text
+    if INTEGER_REGEX.fullmatch(text):
+        return int(text)
+    date = DATE_REGEX.fullmatch(text)
+    if date:
+        try:
+            return get_unix_time(*(int(part) for part in date.groups()))
+        except ValueError:
+            raise QueryError(f"Invalid date: {text}")
+    return text
+
+
+def get_path(word):
+    if word in ALIASES:
+        return ALIASES[word]
+    if word.startswith("appinfo/"):
+        return word[len("appinfo/"):]
+    return word
+
+
+def make_test(op, literal):
+    """
+    Returns a function telling if a value satisfies the comparison.
+    Numbers stored as strings are compared as numbers, and missing
+    values, like sections, which aren't values either, only satisfy !=.
+    """
+    if op == "~":
+        try:
+            pattern = re.compile(str(literal), re.IGNORECASE)
+        except re.error as error:
+            raise QueryError(f"Invalid regular expression {literal!r}: {error}")
+        return lambda value: (
+            value is not None
+            and not isinstance(value, dict)
+            and pattern.search(str(value)) is not None
+        )
+
+    compare = OPERATORS[op]
+
+    def test(value):
+        if value is None or isinstance(value, dict):
+            return op == "!="
+        if isinstance(literal, int) and not isinstance(value, int):
+            try:
+                value = int(value)
+            except ValueError:
+                return op == "!="
+        elif isinstance(literal, str) and not isinstance(value, str):
+            value = str(value)
+        return compare(value, literal)
+
+    return test
+
+
+class Query:
+    """
+    A predicate over key paths, compiled from expressions like
+
+        type == DLC and original_release_date < 2010-01-01
+        developer ~ "valve|hidden path" or not sortas
+
+    A path on its own is true when the app has a non-empty value for
+    it. Predicates are evaluated a column at a time, so they return a
+    list of booleans with one element per row of the columns.
+    """
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.position = 0
+        self.paths = []
+        if not self.tokens:
+            raise QueryError("Empty query")
+        self.evaluate = self.parse_or()
+        if self.position != len(self.tokens):
+            raise QueryError(f"Unexpected {self.tokens[self.position][1]!r}")
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def next(self):
+        token = self.peek()
+        if token[0] is None:
+            raise QueryError("Unexpected end of query")
+        self.position += 1
+        return token
+
+    def parse_or(self):
+        operands = [self.parse_and()]
+        while self.peek() == ("keyword", "or"):
+            self.next()
+            operands.append(self.parse_and())
+        if len(operands) == 1:
+            return operands[0]
+        return lambda get_column: [
+            any(values) for values in zip(*(operand(get_column) for operand in operands))
+        ]
+
+    def parse_and(self):
+        operands = [self.parse_not()]
+        while self.peek() == ("keyword", "and"):
+            self.next()
+            operands.append(self.parse_not())
+        if len(operands) == 1:
+            return operands[0]
+        return lambda get_column: [
+            all(values) for values in zip(*(operand(get_column) for operand in operands))
+        ]
+
+    def parse_not(self):
+        if self.peek() == ("keyword", "not"):
+            self.next()
+            operand = self.parse_not()
+            return lambda get_column: [not value for value in operand(get_column)]
+        return self.parse_atom()
+
+    def parse_atom(self):
+        kind, text = self.next()
+        if (kind, text) == ("symbol", "("):
+            predicate = self.parse_or()
+            if self.next() != ("symbol", ")"):
+                raise QueryError("Expected )")
+            return predicate
+        if kind != "word":
+            raise QueryError(f"Expected a key path, got {text!r}")
+
+        path = get_path(text)
+        if path not in self.paths:
+            self.paths.append(path)
+
+        kind, op = self.peek()
+        if kind != "symbol" or op not in OPERATORS and op != "~":
+            return lambda get_column: [
+                value is not None and value != "" for value in get_column(path)
+            ]
+
+        self.next()
+        kind, text = self.next()
+        if kind not in ("word", "string"):
+            raise QueryError(f"Expected a value after {op}")
+        test = make_test(op, parse_literal(kind, text))
+        return lambda get_column: [test(value) for value in get_column(path)]
+
+
+def run_query(index, text):
+    """
+    Returns the appids of the apps in the index matching the query, in
+    file order.
+    """
+    query = Query(text)
+    index.refresh([path for path in query.paths if path != "appid"])
+    matches = query.evaluate(index.get_column)
+    return [app_id for app_id, match in zip(index.appids, matches) if match]
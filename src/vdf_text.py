@@ -0,0 +1,208 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import re
+import sys
+from timeit import timeit
+
+
+# Quoted strings, braces, comments and conditionals like [$WIN32], and
+# unquoted strings, each in its own group. Leading whitespace is part of
+# the match so the scanner doesn't retry every alternative on it
+TOKEN_REGEX = re.compile(
+    r'\s*(?:"([^"\\]*(?:\\.[^"\\]*)*)"|([{}])|(//[^\n]*|\[[^\]\n]*\])'
+    r'|([^\s"{}]+))'
+)
+ESCAPE_REGEX = re.compile(r"\\(.)", re.DOTALL)
+ESCAPES = {"n": "\n", "t": "\t"}
+
+# Tokens yielded for braces, so they can't be mistaken for a quoted "{"
+OPEN = object()
+CLOSE = object()
+
+
+class TextVDFError(Exception):
+    pass
+
+
+def unescape(string):
+    if "\\" not in string:
+        return string
+    return ESCAPE_REGEX.sub(
+        lambda match: ESCAPES.get(match.group(1), match.group(1)), string
+    )
+
+
+def scan(text):
+    # Every token has to start right where the last one ended, anything
+    # the expression can't match is an error instead of being skipped
+    scanner = TOKEN_REGEX.scanner(text)
+    end = 0
+    for match in iter(scanner.match, None):
+        end = match.end()
+        quoted, brace, skipped, unquoted = match.groups()
+        if brace:
+            yield OPEN if brace == "{" else CLOSE
+        elif unquoted:
+            yield unquoted
+        elif not skipped:
+            yield unescape(quoted or "")
+
+    rest = text[end:].lstrip()
+    if rest.startswith('"'):
+        raise TextVDFError("Unterminated quoted string")
+    if rest:
+        raise TextVDFError(f"Unexpected {rest[0]!r}")
+
+
+def tokenize(text):
+    """
+    Yields every string in the text, and OPEN and CLOSE for braces.
+    Comments and conditionals are skipped.
+
+    Without escapes or comments, a quote always starts or ends a quoted
+    string, so the text is split on them and only what's between quoted
+    strings (whitespace and braces, mostly) goes through the scanner.
+    """
+    if "\\" in text or "//" in text:
+        yield from scan(text)
+        return
+
+    parts = text.split('"')
+    if len(parts) % 2 == 0:
+        raise TextVDFError("Unterminated quoted string")
+    quoted = False
+    for part in parts:
+        if quoted:
+            yield part
+        elif part and not part.isspace():
+            yield from scan(part)
+        quoted = not quoted
+
+
+def loads(text):
+    """
+    Parses text VDF data (libraryfolders.vdf, appmanifest .acf files,
+    etc.) into nested dictionaries.
+    """
+    root = {}
+    stack = [root]
+    section = root
+    key = None
+
+    for token in tokenize(text):
+        if token is OPEN:
+            if key is None:
+                raise TextVDFError("Section without a name")
+            section[key] = {}
+            section = section[key]
+            stack.append(section)
+            key = None
+        elif token is CLOSE:
+            if key is not None or len(stack) == 1:
+                raise TextVDFError("Unexpected closing brace")
+            stack.pop()
+            section = stack[-1]
+        elif key is None:
+            key = token
+        else:
+            section[key] = token
+            key = None
+
+    if key is not None or len(stack) != 1:
+        raise TextVDFError("Unexpected end of data")
+    return root
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as vdf:
+        return loads(vdf.read())
+
+
+def get_child(data, key, default=None):
+    # Keys aren't case sensitive, older files use "LibraryFolders"
+    for child_key, value in data.items():
+        if child_key.lower() == key:
+            return value
+    return default
+
+
+def read_app_manifest(library, app_id):
+    path = os.path.join(library, "steamapps", f"appmanifest_{app_id}.acf")
+    return get_child(load(path), "appstate", {})
+
+
+def get_app_libraries(libraryfolders):
+    """
+    Maps every appid installed in one of the given libraries (as parsed
+    from libraryfolders.vdf) to the path of its library.
+    """
+    app_libraries = {}
+    for key, library in get_child(libraryfolders, "libraryfolders", {}).items():
+        if isinstance(library, dict):
+            path = library.get("path")
+            apps = library.get("apps")
+        elif key.isdigit():
+            # Older files only list the paths of the libraries
+            path = library
+            apps = None
+        else:
+            continue
+        if not path:
+            continue
+
+        if apps is None:
+            # The apps are only known through their manifests
+            try:
+                apps = [
+                    entry.name[len("appmanifest_"):-len(".acf")]
+                    for entry in os.scandir(os.path.join(path, "steamapps"))
+                    if entry.name.startswith("appmanifest_")
+                    and entry.name.endswith(".acf")
+                ]
+            except OSError:
+                apps = []
+
+        for app in apps:
+            if app.isdigit():
+                app_libraries[int(app)] = path
+
+    return app_libraries
+
+
+def benchmark(path, number=1000):
+    # Compares the tokenizer against the regular expressions that used
+    # to be used to read libraryfolders.vdf
+    path_regex = re.compile('"path"\t\t"(.*)"')
+    app_regex = re.compile('"([0-9]+)"\t\t"[0-9]+"')
+    with open(path, "r", encoding="utf-8", errors="replace") as vdf:
+        text = vdf.read()
+
+    def with_regex():
+        path_regex.findall(text)
+        [int(x) for x in app_regex.findall(text)]
+
+    def with_tokenizer():
+        get_app_libraries(loads(text))
+
+    for name, function in (("regex", with_regex), ("tokenizer", with_tokenizer)):
+        seconds = timeit(function, number=number)
+        print(f"{name}: {seconds / number * 1000000:.1f}us per parse")
+
+
+if __name__ == "__main__":
+    benchmark(sys.argv[1])
@@ -0,0 +1,78 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import mmap
+from concurrent.futures import ThreadPoolExecutor
+
+from appinfo import check_checksums, check_layout
+
+
+# Bytes of app bodies hashed by a single task
+BATCH_BYTES = 4 * 1024 * 1024
+
+
+def verify_appinfo(vdf_path, jobs=None):
+    """
+    Checks the structure of appinfo.vdf without decoding it: that the
+    app sizes lead from one app to the next up to the appid 0 that ends
+    the list, that every body matches its checksum_binary, and on
+    APPINFO_29 that the string table offset and count are right.
+
+    Bodies are hashed in batches by a pool of jobs threads (hashlib
+    releases the GIL) over a memory map of the file. Returns a report
+    with the number of apps, the corrupt appids with the reason and any
+    errors in the file as a whole.
+    """
+    report = {"apps": 0, "corrupt": [], "errors": [], "strings": None, "size": 0}
+
+    with open(vdf_path, "rb") as vdf:
+        try:
+            data = mmap.mmap(vdf.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            report["errors"].append("The file is empty")
+            return report
+
+    with data:
+        report["size"] = len(data)
+        spans = check_layout(data, report)
+        report["apps"] = len(spans)
+
+        batches = []
+        batch = []
+        batch_bytes = 0
+        for span in spans:
+            batch.append(span)
+            batch_bytes += span[2] - span[1]
+            if batch_bytes >= BATCH_BYTES:
+                batches.append(batch)
+                batch = []
+                batch_bytes = 0
+        if batch:
+            batches.append(batch)
+
+        with memoryview(data) as view, ThreadPoolExecutor(max_workers=jobs) as executor:
+            for mismatched in executor.map(lambda spans: check_checksums(view, spans), batches):
+                report["corrupt"].extend(
+                    (app_id, "checksum_binary doesn't match") for app_id in mismatched
+                )
+
+    return report
+
+
+def format_report(report):
+    for app_id, reason in report["corrupt"]:
+        yield f"{app_id}\t{reason}"
+    yield from report["errors"]
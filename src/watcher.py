@@ -0,0 +1,213 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import json
+import select
+import ctypes
+import ctypes.util
+from json import JSONDecodeError
+from struct import unpack_from
+from time import monotonic, sleep
+
+from appinfo import Appinfo, CorruptedDataError
+from header_table import HeaderTable
+
+
+# Seconds without changes before the file is considered written
+DEBOUNCE_DELAY = 2
+POLL_INTERVAL = 1
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+INOTIFY_EVENT_SIZE = 16
+
+
+class InotifyWatcher:
+    def __init__(self, path):
+        # The directory is watched since Steam may replace the file
+        directory, name = os.path.split(os.path.abspath(path))
+        self.name = os.fsencode(name)
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def wait(self, timeout=None):
+        # Returns True if the file changed before the timeout ran out
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - monotonic(), 0)
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return False
+
+            events = os.read(self.fd, 64 * 1024)
+            offset = 0
+            while offset < len(events):
+                length = unpack_from("iIII", events, offset)[3]
+                name = events[
+                    offset + INOTIFY_EVENT_SIZE:offset + INOTIFY_EVENT_SIZE + length
+                ]
+                offset += INOTIFY_EVENT_SIZE + length
+                if name.rstrip(b"\x00") == self.name:
+                    return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    def __init__(self, path):
+        self.path = path
+        self.last_stat = self.stat()
+
+    def stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else monotonic() + timeout
+        while deadline is None or monotonic() < deadline:
+            sleep(POLL_INTERVAL)
+            current_stat = self.stat()
+            if current_stat != self.last_stat:
+                self.last_stat = current_stat
+                return True
+        return False
+
+    def close(self):
+        pass
+
+
+def create_watcher(path):
+    try:
+        return InotifyWatcher(path)
+    except (OSError, AttributeError, TypeError):
+        # No inotify on this system
+        return PollingWatcher(path)
+
+
+class ModificationWatcher:
+    """
+    Watches appinfo.vdf and re-applies the modifications Steam
+    overwrote. Apps are checked through their header checksums, so only
+    the ones that were actually clobbered get decoded and patched, all
+    of them in a single write.
+    """
+
+    def __init__(self, vdf_path, modifications_path, jobs=None):
+        self.vdf_path = vdf_path
+        self.modifications_path = modifications_path
+        self.jobs = jobs
+        self.modifications = {}
+        self.modifications_mtime = None
+        # checksum_binary of every app right after it was patched
+        self.patched = {}
+
+    def load_modifications(self):
+        try:
+            mtime = os.stat(self.modifications_path).st_mtime_ns
+        except FileNotFoundError:
+            self.modifications = {}
+            return
+        if mtime == self.modifications_mtime:
+            return
+
+        try:
+            with open(self.modifications_path, "r") as mod:
+                jsonData = json.load(mod)
+        except JSONDecodeError:
+            # Probably being written, it'll be read on the next change
+            return
+        self.modifications = {
+            int(app): data["modified"]
+            for app, data in jsonData.items()
+            if "modified" in data
+        }
+        self.modifications_mtime = mtime
+        # Modifications may have been edited, check every app again
+        self.patched = {}
+
+    def reapply(self):
+        """
+        Patches back every modified app that doesn't hold its modified
+        data anymore. Returns the patched appids.
+        """
+        self.load_modifications()
+        if not self.modifications:
+            return []
+
+        appinfo = Appinfo(self.vdf_path, lazy=True)
+        table = HeaderTable(appinfo)
+
+        clobbered = []
+        for app, modified in self.modifications.items():
+            if app not in table:
+                continue
+            checksum = table.get_header(app)["checksum_binary"]
+            if checksum == self.patched.get(app):
+                continue
+            # Unknown checksum, only decode it to see if it still has
+            # our data
+            if appinfo.parsedAppInfo[app]["sections"] == modified:
+                self.patched[app] = checksum
+            else:
+                clobbered.append(app)
+
+        if not clobbered:
+            return []
+
+        for app in clobbered:
+            appinfo.parsedAppInfo[app]["sections"] = self.modifications[app]
+        appinfo.update_apps(clobbered, self.jobs)
+        # Writing may rebuild the string table, which can change checksums
+        appinfo.write_data()
+        for app in clobbered:
+            self.patched[app] = appinfo.parsedAppInfo[app]["checksum_binary"]
+
+        return clobbered
+
+    def run(self, log=print):
+        watcher = create_watcher(self.vdf_path)
+        try:
+            while True:
+                try:
+                    patched = self.reapply()
+                except CorruptedDataError as error:
+                    # Nothing was written, it's tried again on the next
+                    # change
+                    log(f"Couldn't re-apply the modifications: {error}")
+                    patched = []
+                if patched:
+                    log(f"Re-applied modifications to {len(patched)} apps: "
+                        + ", ".join(str(app) for app in patched))
+
+                # Wait until Steam is done writing the file
+                watcher.wait()
+                while watcher.wait(DEBOUNCE_DELAY):
+                    pass
+        finally:
+            watcher.close()
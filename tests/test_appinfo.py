@@ -0,0 +1,291 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import json
+from hashlib import sha1
+from struct import pack, pack_into, unpack_from
+
+import pytest
+
+from appinfo import (
+    APP_HEADER_SIZE,
+    APPINFO_28,
+    APPINFO_29,
+    Appinfo,
+    CorruptedDataError,
+    check_layout,
+)
+
+
+def encode_sections(version, sections, string_pool):
+    data = b""
+    for key, value in sections.items():
+        if version == APPINFO_29:
+            if key not in string_pool:
+                string_pool.append(key)
+            encoded_key = pack("<I", string_pool.index(key))
+        else:
+            encoded_key = key.encode() + b"\x00"
+        if isinstance(value, dict):
+            data += b"\x00" + encoded_key + encode_sections(version, value, string_pool)
+        elif isinstance(value, str):
+            data += b"\x01" + encoded_key + value.encode() + b"\x00"
+        else:
+            data += b"\x02" + encoded_key + pack("<I", value)
+    return data + b"\x08"
+
+
+def build_appinfo(version, apps, string_pool=()):
+    # string_pool holds the keys at the start of the string table on
+    # APPINFO_29, used or not
+    string_pool = list(string_pool)
+    data = b""
+    for app_id, sections in apps.items():
+        body = encode_sections(version, sections, string_pool)
+        data += pack(
+            "<4IQ20sI20s",
+            app_id, len(body) + 60, 2, 1700000000, 0,
+            sha1(app_id.to_bytes(4, "little")).digest(), 1, sha1(body).digest(),
+        ) + body
+    data += pack("<I", 0)
+    if version == APPINFO_28:
+        return pack("<Q", version) + data
+    strings = b"".join(key.encode() + b"\x00" for key in string_pool)
+    return (
+        pack("<Qq", version, 16 + len(data)) + data
+        + pack("<I", len(string_pool)) + strings
+    )
+
+
+APPS = {
+    10: {
+        "appinfo": {
+            "appid": 10,
+            "common": {
+                "associations": {
+                    "0": {"name": "Valve", "type": "developer"},
+                    "1": {"name": "Valve", "type": "publisher"},
+                },
+                "name": "Counter-Strike",
+                "type": "Game",
+            },
+            "extended": {"developer": "Valve", "homepage": "http://www.counter-strike.net/"},
+        },
+    },
+    20: {
+        "appinfo": {
+            "appid": 20,
+            "common": {"name": "Team Fortress Classic", "type": "Game"},
+            "extended": {"developer": "Valve"},
+        },
+    },
+}
+
+
+@pytest.fixture(params=[APPINFO_28, APPINFO_29], ids=["v28", "v29"])
+def vdf_path(request, tmp_path):
+    path = tmp_path / "appinfo.vdf"
+    path.write_bytes(build_appinfo(request.param, APPS))
+    return str(path)
+
+
+def test_iter_fields_with_a_deep_and_a_sibling_path(vdf_path):
+    appinfo = Appinfo(vdf_path, stream=True)
+    paths = ["appinfo/common/associations/0/name", "appinfo/extended/developer"]
+    assert dict(appinfo.iter_fields(paths)) == {
+        10: {
+            "appinfo/common/associations/0/name": "Valve",
+            "appinfo/extended/developer": "Valve",
+        },
+        20: {"appinfo/extended/developer": "Valve"},
+    }
+
+
+def full_encode(appinfo, sections):
+    # Encodes sections from scratch, without copying any original bytes
+    plain = json.loads(json.dumps(sections))
+    return bytes(appinfo.encode_subsections(plain))
+
+
+def test_assigned_section_is_copied(vdf_path):
+    appinfo = Appinfo(vdf_path)
+    first = appinfo.parsedAppInfo[10]["sections"]
+    second = appinfo.parsedAppInfo[20]["sections"]
+
+    second["appinfo"]["common"] = first["appinfo"]["common"]
+    first["appinfo"]["common"]["name"] = "Counter-Strike 1.6"
+
+    assert second["appinfo"]["common"]["name"] == "Counter-Strike"
+    for sections in (first, second):
+        assert bytes(appinfo.encode_subsections(sections)) == full_encode(appinfo, sections)
+
+
+def read_string_table(data):
+    # Checks the string table offset of an APPINFO_29 file and returns
+    # its keys
+    offset = unpack_from("<q", data, 8)[0]
+    assert data[offset - 4:offset] == b"\x00\x00\x00\x00"
+    count = unpack_from("<I", data, offset)[0]
+    keys = data[offset + 4:].split(b"\x00")
+    assert keys[-1] == b"" and len(keys) - 1 == count
+    return [key.decode() for key in keys[:-1]]
+
+
+def test_unused_keys_already_in_the_file_are_dropped(tmp_path):
+    path = tmp_path / "appinfo.vdf"
+    path.write_bytes(build_appinfo(APPINFO_29, APPS, ["unused"]))
+    Appinfo(str(path), lazy=True).write_data()
+    assert path.read_bytes() == build_appinfo(APPINFO_29, APPS)
+
+
+def test_string_table_add_and_remove_round_trip(tmp_path):
+    path = tmp_path / "appinfo.vdf"
+    original = build_appinfo(APPINFO_29, APPS)
+    path.write_bytes(original)
+    keys = read_string_table(original)
+
+    appinfo = Appinfo(str(path))
+    appinfo.parsedAppInfo[10]["sections"]["appinfo"]["common"]["sortas"] = "CS"
+    appinfo.update_apps([10])
+    appinfo.write_data()
+    assert read_string_table(path.read_bytes()) == keys + ["sortas"]
+    assert Appinfo(str(path)).parsedAppInfo[10]["sections"]["appinfo"]["common"]["sortas"] == "CS"
+
+    del appinfo.parsedAppInfo[10]["sections"]["appinfo"]["common"]["sortas"]
+    appinfo.update_apps([10])
+    appinfo.write_data()
+    data = path.read_bytes()
+    assert read_string_table(data) == keys
+    # Only the checksum_text of the edited app differs from the original
+    assert data[:40] + data[60:] == original[:40] + original[60:]
+
+
+@pytest.mark.parametrize(
+    "edit",
+    [
+        lambda sections: sections["appinfo"]["common"]["associations"]["0"].update(name="Sierra"),
+        lambda sections: sections["appinfo"]["common"].pop("associations"),
+        lambda sections: sections["appinfo"]["extended"].setdefault("sortas", "CS"),
+        lambda sections: sections["appinfo"].__setitem__("config", {"launch": {}}),
+    ],
+    ids=["nested value", "removed section", "added key", "added section"],
+)
+def test_edited_app_encodes_like_a_full_encode(vdf_path, edit):
+    appinfo = Appinfo(vdf_path)
+    sections = appinfo.parsedAppInfo[10]["sections"]
+    # The untouched app is copied from the file
+    assert bytes(appinfo.encode_subsections(sections)) == appinfo.get_app_bytes(10)[68:]
+    appinfo.dict_to_text_vdf(sections)
+
+    edit(sections)
+    assert bytes(appinfo.encode_subsections(sections)) == full_encode(appinfo, sections)
+    plain = json.loads(json.dumps(sections))
+    assert appinfo.dict_to_text_vdf(sections) == appinfo.dict_to_text_vdf(plain)
+
+
+def edit_apps(appinfo):
+    apps = appinfo.parsedAppInfo
+    apps[10]["sections"]["appinfo"]["common"]["name"] = "Counter-Strike: Condition Zero"
+    del apps[20]["sections"]["appinfo"]["extended"]
+    apps[30] = dict(apps[20], appid=30)
+    apps[30]["sections"] = {"appinfo": {"appid": 30, "common": {"name": "Day of Defeat"}}}
+    return [10, 20, 30]
+
+
+def test_apps_are_spliced_like_one_by_one(vdf_path):
+    one_by_one = Appinfo(vdf_path)
+    for app_id in edit_apps(one_by_one):
+        one_by_one.update_app(app_id)
+
+    appinfo = Appinfo(vdf_path)
+    appinfo.update_apps(edit_apps(appinfo), jobs=4)
+    assert appinfo.appinfoData == one_by_one.appinfoData
+
+    # The string table is only written by write_data
+    report = {"corrupt": [], "errors": []}
+    spans = check_layout(appinfo.appinfoData, report)
+    assert report["corrupt"] == []
+    assert [app_id for app_id, start, end in spans] == [10, 20, 30]
+    for app_id, start, end in spans:
+        header = appinfo.parsedAppInfo[app_id]
+        body = appinfo.appinfoData[start + APP_HEADER_SIZE:end]
+        assert header["size"] == end - start - 8
+        assert header["checksum_binary"] == sha1(body).digest()
+        assert header["checksum_text"] == sha1(
+            appinfo.dict_to_text_vdf(header["sections"])
+        ).digest()
+
+
+def test_keys_dropped_in_the_middle_of_the_pool(tmp_path):
+    path = tmp_path / "appinfo.vdf"
+    path.write_bytes(build_appinfo(APPINFO_29, APPS))
+    appinfo = Appinfo(str(path), lazy=True)
+    del appinfo.parsedAppInfo[10]["sections"]["appinfo"]["common"]["associations"]
+    appinfo.update_apps([10])
+    appinfo.write_data()
+
+    # Same file as if it never had the keys of the associations, apart
+    # from the checksum_text of the edited app
+    apps = json.loads(json.dumps(APPS))
+    del apps["10"]["appinfo"]["common"]["associations"]
+    expected = build_appinfo(APPINFO_29, {int(app_id): app for app_id, app in apps.items()})
+    data = path.read_bytes()
+    assert "associations" not in read_string_table(data)
+    assert data[:40] + data[60:] == expected[:40] + expected[60:]
+    assert Appinfo(str(path)).parsedAppInfo[20]["sections"] == APPS[20]
+
+
+def corrupt_size(appinfo):
+    start = appinfo.get_apps_start()
+    size = unpack_from("<I", appinfo.appinfoData, start + 4)[0]
+    pack_into("<I", appinfo.appinfoData, start + 4, size + 1)
+
+
+def corrupt_body(appinfo):
+    # Only checked for apps rewritten since the last write
+    appinfo.appinfoData[appinfo.get_apps_start() + APP_HEADER_SIZE + 1] ^= 1
+    appinfo.rewritten_apps.add(10)
+
+
+def corrupt_end(appinfo):
+    if appinfo.version == APPINFO_29:
+        offset = unpack_from("<q", appinfo.appinfoData, 8)[0]
+        pack_into("<q", appinfo.appinfoData, 8, offset - 1)
+    else:
+        appinfo.appinfoData += b"\x00"
+
+
+@pytest.mark.parametrize(
+    "corrupt", [corrupt_size, corrupt_body, corrupt_end], ids=["size", "body", "end"]
+)
+def test_corrupted_data_is_rejected(vdf_path, corrupt):
+    appinfo = Appinfo(vdf_path, lazy=True)
+    appinfo.validate_data()
+    corrupt(appinfo)
+    with pytest.raises(CorruptedDataError):
+        appinfo.validate_data()
+
+
+def test_corrupted_data_is_not_written(vdf_path):
+    with open(vdf_path, "rb") as vdf:
+        original = vdf.read()
+    appinfo = Appinfo(vdf_path, lazy=True)
+    corrupt_size(appinfo)
+    with pytest.raises(CorruptedDataError):
+        appinfo.write_data()
+    with open(vdf_path, "rb") as vdf:
+        assert vdf.read() == original
@@ -0,0 +1,53 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from appinfo import APPINFO_28, APPINFO_29, Appinfo
+from backups import OriginalStore
+from test_appinfo import APPS, build_appinfo
+
+
+def load_appinfo(tmp_path, version):
+    path = tmp_path / f"{version:x}.vdf"
+    path.write_bytes(build_appinfo(version, APPS))
+    return Appinfo(str(path), lazy=True)
+
+
+def test_originals_of_another_version_are_kept(tmp_path):
+    old = load_appinfo(tmp_path, APPINFO_28)
+    new = load_appinfo(tmp_path, APPINFO_29)
+    store_path = str(tmp_path / "originals.bin")
+
+    store = OriginalStore(store_path)
+    store.save(old, 10)
+    store.save(old, 20)
+    store.save(new, 20)
+
+    for store in (store, OriginalStore(store_path)):
+        assert store.load(old, 10) == old.get_app_bytes(10)
+        assert store.load(new, 10) is None
+        assert store.load(old, 20) is None
+        assert store.load(new, 20) == new.get_app_bytes(20)
+
+    # Rewriting the file keeps the records of both versions
+    store.remove({20})
+    assert 20 not in store
+    store.save(new, 20)
+    store.rewrite(store.records)
+    store = OriginalStore(store_path)
+    assert store.version == APPINFO_29
+    assert store.load(old, 10) == old.get_app_bytes(10)
+    assert store.load(new, 20) == new.get_app_bytes(20)
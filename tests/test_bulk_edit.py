@@ -0,0 +1,99 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+
+import pytest
+
+from bulk_edit import BulkEditError, load_bulk_edit
+
+
+RULES = [
+    {"path": "common/name", "replace": ["™", ""]},
+    {"path": "common/sortas", "copy": "common/name", "apps": [70]},
+]
+
+
+def write_json(tmp_path, data):
+    path = tmp_path / "edit.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return str(path)
+
+
+def describe(edit):
+    return [(rule.path, rule.action, rule.apps) for rule in edit.rules], edit.mapping
+
+
+@pytest.mark.parametrize("data", [RULES, {"rules": RULES}])
+def test_rules(tmp_path, data):
+    edit = load_bulk_edit(write_json(tmp_path, data))
+    assert describe(edit) == (
+        [("common/name", "replace", None), ("common/sortas", "copy", {70})],
+        {},
+    )
+    assert edit.apply(70, {"common/name": "Half-Life™"}) == {
+        "common/name": "Half-Life",
+        "common/sortas": "Half-Life",
+    }
+
+
+def test_rules_and_mapping(tmp_path):
+    edit = load_bulk_edit(
+        write_json(tmp_path, {"rules": RULES, "mapping": {"10": {"common/name": "CS"}}})
+    )
+    assert edit.mapping == {10: {"common/name": "CS"}}
+
+
+def test_mapping(tmp_path):
+    edit = load_bulk_edit(write_json(tmp_path, {"70": {"common/name": "Half-Life"}}))
+    assert describe(edit) == ([], {70: {"common/name": "Half-Life"}})
+
+
+def test_csv(tmp_path):
+    path = tmp_path / "edit.csv"
+    path.write_text("appid,common/original_release_date,common/name\n70,,Half-Life\n")
+    assert load_bulk_edit(str(path)).mapping == {70: {"common/name": "Half-Life"}}
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        [{"set": "x"}],
+        [{"path": "common/name"}],
+        [{"path": "common/name", "set": "x", "strip": True}],
+        {"rules": RULES, "mapping": []},
+        {"not an appid": {}},
+        "rules",
+    ],
+)
+def test_invalid(tmp_path, data):
+    with pytest.raises(BulkEditError):
+        load_bulk_edit(write_json(tmp_path, data))
+
+
+def test_csv_numbers_keep_the_type_of_the_key(tmp_path):
+    path = tmp_path / "edit.csv"
+    path.write_text(
+        "appid,common/sortas,common/name,common/metacritic_score,common/original_release_date\n"
+        + "70,007,1942,92,1998-11-19\n"
+    )
+    edit = load_bulk_edit(str(path))
+    values = {"common/sortas": "Half-Life", "common/metacritic_score": 96}
+    changed = edit.apply(70, values)
+    assert changed["common/sortas"] == "007"
+    assert changed["common/name"] == "1942"
+    assert changed["common/metacritic_score"] == 92
+    assert isinstance(changed["common/original_release_date"], int)
@@ -0,0 +1,85 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from hashlib import sha1
+from struct import pack
+
+import pytest
+
+from appinfo import APPINFO_28, APPINFO_29
+from history import HistoryError, HistoryStore
+
+
+def build_appinfo(version, bodies):
+    # appinfo.vdf with the given app bodies, which history never decodes
+    apps = b""
+    for app_id, body in bodies.items():
+        apps += pack(
+            "<4IQ20sI20s",
+            app_id, len(body) + 60, 2, 1700000000, 0,
+            sha1(app_id.to_bytes(4, "little")).digest(), 1, sha1(body).digest(),
+        ) + body
+    apps += pack("<I", 0)
+    if version == APPINFO_28:
+        return pack("<Q", version) + apps
+    strings = b"appinfo\x00common\x00name\x00"
+    return pack("<Qq", version, 16 + len(apps)) + apps + pack("<I", 3) + strings
+
+
+@pytest.mark.parametrize("version", [APPINFO_28, APPINFO_29])
+def test_restore_is_byte_exact(tmp_path, version):
+    store = HistoryStore(str(tmp_path / "history"))
+    vdf_path = tmp_path / "appinfo.vdf"
+    versions = [
+        build_appinfo(version, {10: b"\x00ten\x08\x08", 20: b"\x00twenty\x08\x08"}),
+        build_appinfo(version, {10: b"\x00ten\x08\x08", 20: b"\x00edited\x08\x08", 30: b"\x08\x08"}),
+    ]
+
+    names = []
+    for data in versions:
+        vdf_path.write_bytes(data)
+        name, new_count = store.snapshot(str(vdf_path))
+        names.append(name)
+    assert None not in names
+    # The second snapshot only stores the new bodies, and the header on
+    # APPINFO_29, where the string table moved
+    assert new_count == (3 if version == APPINFO_29 else 2)
+    assert store.snapshot(str(vdf_path))[0] is None
+
+    for name, data in zip(names, versions):
+        output_path = tmp_path / "restored.vdf"
+        store.restore(name, str(output_path))
+        assert output_path.read_bytes() == data
+
+
+def test_truncated_file_is_kept_in_the_tail(tmp_path):
+    store = HistoryStore(str(tmp_path / "history"))
+    vdf_path = tmp_path / "appinfo.vdf"
+    data = build_appinfo(APPINFO_28, {10: b"\x00ten\x08\x08"})[:-4] + pack("<I", 20)[:3]
+    vdf_path.write_bytes(data)
+    name, new_count = store.snapshot(str(vdf_path))
+
+    output_path = tmp_path / "restored.vdf"
+    store.restore(name, str(output_path))
+    assert output_path.read_bytes() == data
+
+
+@pytest.mark.parametrize("data", [b"", pack("<I", 0x07564429)])
+def test_file_without_a_version(tmp_path, data):
+    vdf_path = tmp_path / "appinfo.vdf"
+    vdf_path.write_bytes(data)
+    with pytest.raises(HistoryError):
+        HistoryStore(str(tmp_path / "history")).snapshot(str(vdf_path))
@@ -0,0 +1,66 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from query import Query, QueryError
+
+
+COLUMNS = {
+    "common/name": ["Half-Life", "Portal", None],
+    "common/type": ["Game", "Game", "DLC"],
+    "depots": [{"1": {"name": "Half-Life"}}, "3", None],
+    "common/original_release_date": ["911433600", "1191888000", None],
+}
+
+
+def run(text):
+    return Query(text).evaluate(COLUMNS.__getitem__)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("type == Game", [True, True, False]),
+        ("name ~ half", [True, False, False]),
+        ("not name", [False, False, True]),
+        ("original_release_date < 2000-01-01", [True, False, False]),
+        ("type == DLC or name == Portal", [False, True, True]),
+    ],
+)
+def test_comparisons(text, expected):
+    assert run(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("depots == 3", [False, True, False]),
+        ("depots != 3", [True, False, True]),
+        ("depots > 1", [False, True, False]),
+        ("depots == x", [False, False, False]),
+        ("depots ~ half", [False, False, False]),
+        ("depots", [True, True, False]),
+    ],
+)
+def test_sections_are_not_values(text, expected):
+    assert run(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "name ==", "(name", "name ~ \"(\"", "== 3"])
+def test_invalid(text):
+    with pytest.raises(QueryError):
+        Query(text)
@@ -0,0 +1,94 @@
+# A Metadata Editor for Steam Applications
+# Copyright (C) 2023  Tomás Ralph
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from vdf_text import TextVDFError, get_app_libraries, loads
+
+
+LIBRARYFOLDERS = """
+"libraryfolders"
+{
+	"0"
+	{
+		"path"		"/home/user/.local/share/Steam"
+		"label"		""
+		"apps"
+		{
+			"228980"		"171262082"
+			"1091500"		"70172461022"
+		}
+	}
+	"1"
+	{
+		"path"		"/mnt/games/SteamLibrary"
+		"apps"
+		{
+			"620"		"12751472906"
+		}
+	}
+}
+"""
+
+
+def test_libraryfolders():
+    assert get_app_libraries(loads(LIBRARYFOLDERS)) == {
+        228980: "/home/user/.local/share/Steam",
+        1091500: "/home/user/.local/share/Steam",
+        620: "/mnt/games/SteamLibrary",
+    }
+
+
+def test_escapes_comments_and_conditionals():
+    text = r"""
+    // A comment with "quotes"
+    "AppState"
+    {
+        "name"  "Say \"hi\"\tnow"  [$WIN32]
+        "path"  "C:\\Games"
+        unquoted  value
+        "empty"  ""
+    }
+    """
+    assert loads(text) == {
+        "AppState": {
+            "name": 'Say "hi"\tnow',
+            "path": "C:\\Games",
+            "unquoted": "value",
+            "empty": "",
+        }
+    }
+
+
+def test_quoted_braces_are_strings():
+    assert loads('"a" "{" "b" "}"') == {"a": "{", "b": "}"}
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '"a" { "b" "c }',
+        '"a" { "b" "c" } "d',
+        '// comment\n"a" { "b" "c \\" }',
+        '"a" { "b" "c" }}',
+        '"a" { "b" "c"',
+        '{ "b" "c" }',
+        '"a" "b" "c"',
+    ],
+)
+def test_malformed(text):
+    with pytest.raises(TextVDFError):
+        loads(text)